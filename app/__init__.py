@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, render_template
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -15,8 +15,8 @@ db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 mail = Mail()
-# Verwende einfachen Threading-Modus (kein eventlet/gevent nötig)
-socketio = SocketIO(async_mode='threading')
+# async_mode + Message Queue werden in create_app aus der Konfiguration bestimmt (app/socketio_queue.py)
+socketio = SocketIO()
 csrf = CSRFProtect()
 
 # App Startzeitpunkt (für Systeminfo/Uptime)
@@ -25,6 +25,9 @@ APP_START = datetime.utcnow()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Datei-Uploads an @image_upload Endpoints direkt gestreamt (app.uploads)
+    from app.uploads import UploadRequest
+    app.request_class = UploadRequest
 
     # (Hinweis) Socket.IO Client wird jetzt fest im Repository ausgeliefert (app/static/js/socket.io.full.min.js)
     
@@ -38,12 +41,20 @@ def create_app():
     except Exception:
         pass
     
+    # Connection Pool (pre_ping, recycle, Größe nach Worker-Modell) + Kennzahlen für /admin/system
+    from app.db_pool import engine_options
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     # Initialisiere Erweiterungen
     db.init_app(app)
+    # Latenz/SQL-Kennzahlen pro Endpoint (/admin/metrics, /admin/system)
+    from app import metrics
+    metrics.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     mail.init_app(app)
-    socketio.init_app(app)
+    from app.socketio_queue import socketio_options
+    socketio.init_app(app, **socketio_options(app.config))
     csrf.init_app(app)
     
     login_manager.login_view = 'auth.login'
@@ -76,16 +87,41 @@ def create_app():
     # Socket.IO Event Handler laden
     from . import socket_handlers  # noqa: F401
 
+    # Asynchrone Zustellung von E-Mail/Push aus der NotificationEvent Outbox
+    from app import notification_dispatcher
+    notification_dispatcher.init_app(app)
+    # Inhaltsadressierte Foto-/Avatar-Ablage (CLI: flask storage-gc)
+    from app import storage
+    storage.init_app(app)
+    # Bildverarbeitung: fehlende Derivate nachholen (CLI: flask images-backfill)
+    from app import image_jobs
+    image_jobs.init_app(app)
+    # Materialisierte Admin-Zähler (CLI: flask stats-reconcile)
+    from app import stat_counters
+    stat_counters.init_app(app)
+    # Volltextsuche Audit/Chat (CLI: flask search-rebuild)
+    from app import search
+    search.init_app(app)
+
     # Context Processor für Asset-Version (Cache Busting)
     @app.context_processor
     def inject_asset_version():
         return { 'static_version': app.config.get('ASSET_VERSION', '1') }
 
+    # Fingerprinted Static Assets: static_url()/static_urls() in Templates, CLI: flask assets-build
+    from app import assets
+    assets.init_app(app)
+
     # Root-Scope Service Worker Bereitstellung, damit Push-Status auf allen Seiten ermittelbar ist.
     @app.route('/sw.js')
-    def service_worker():  # pragma: no cover - trivial static proxy
-        # Datei liegt physisch unter static/js/sw.js
-        return app.send_static_file('js/sw.js')
+    def service_worker():
+        # Datei liegt physisch unter static/js/sw.js, Precache-Liste kommt aus dem Asset-Manifest
+        return assets.service_worker()
+
+    # Fallback-Seite des Service Workers ohne Netz (wird vorab gecacht, daher ohne Benutzerdaten)
+    @app.route('/offline')
+    def offline():
+        return render_template('offline.html')
     
     # Logging Setup (einmalig)
     _setup_logging(app)
@@ -1,9 +1,9 @@
 from flask import render_template, request, redirect, url_for, flash, Response, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import func, case
+from sqlalchemy import func, case, or_, and_
 from app.admin import bp
-from app import db, APP_START
-from app.models import User, Event, Message, Photo, AuditLog
+from app import db, APP_START, user_cache, notification_prefs, db_pool, metrics, stat_counters, csv_export, search as fulltext
+from app.models import User, Event, Expense, Message, Photo, AuditLog
 from datetime import date, datetime, timedelta
 from flask_wtf.csrf import generate_csrf
 
@@ -40,14 +40,17 @@ def _compute_activity_metrics():
     }
 
 def _base_stats():
+    # Materialisierte Zähler (app.stat_counters): eine Abfrage statt COUNT(*) je Tabelle
+    from flask import current_app
+    counters = stat_counters.read(current_app._get_current_object())
     return {
-        'users_total': db.session.scalar(db.select(func.count(User.id))),
-        'users_soft_deleted': db.session.scalar(db.select(func.count(User.id)).filter(User.deleted_at.is_not(None))),
-        'events_total': db.session.scalar(db.select(func.count(Event.id))),
+        'users_total': counters['users_total'],
+        'users_soft_deleted': counters['users_soft_deleted'],
+        'events_total': counters['events_total'],
     'expenses_total': 0,
-        'messages_total': db.session.scalar(db.select(func.count(Message.id))),
-        'photos_total': db.session.scalar(db.select(func.count(Photo.id))),
-        'recurring_active': db.session.scalar(db.select(func.count(RecurringTransaction.id)).filter(RecurringTransaction.active.is_(True)))
+        'messages_total': counters['messages_total'],
+        'photos_total': counters['photos_total'],
+        'recurring_active': counters['recurring_active']
     }
 
 @bp.route('/')
@@ -90,39 +93,84 @@ def api_dashboard():
         ]
     })
 
+AUDIT_PAGE_SIZE = 50
+AUDIT_EXPORT_BATCH = 2000
+
+def _audit_filtered(stmt, action, search):
+    if action:
+        stmt = stmt.filter(AuditLog.action==action)
+    if search:
+        # Volltext über details (app.search); Action wird über den Filter gewählt
+        stmt = stmt.filter(fulltext.condition(AuditLog, search))
+    return stmt
+
+def _audit_cursor(created_at, log_id):
+    if created_at is None:
+        return None  # Altbestand ohne Zeitstempel: keine Seitengrenze möglich
+    return f"{created_at.isoformat()}_{log_id}"
+
+def _parse_audit_cursor(value):
+    """'<created_at ISO>_<id>' -> (datetime, id) oder None."""
+    ts, _, log_id = (value or '').rpartition('_')
+    try:
+        return datetime.fromisoformat(ts), int(log_id)
+    except ValueError:
+        return None
+
+def _audit_keyset(stmt, before=None, after=None, limit=AUDIT_PAGE_SIZE):
+    """Keyset-Pagination über (created_at, id), neueste zuerst.
+
+    before: Seite nach dieser Grenze (ältere Einträge), after: Seite davor (neuere, aufsteigend
+    sortiert – der Aufrufer dreht um). Es wird limit+1 geladen, um eine weitere Seite zu erkennen.
+    Kein OFFSET und kein COUNT: jede Seite ist ein Bereichs-Scan auf dem Index.
+    """
+    if after:
+        ts, log_id = after
+        stmt = stmt.filter(or_(AuditLog.created_at > ts, and_(AuditLog.created_at == ts, AuditLog.id > log_id)))
+        stmt = stmt.order_by(AuditLog.created_at.asc(), AuditLog.id.asc())
+    else:
+        if before:
+            ts, log_id = before
+            stmt = stmt.filter(or_(AuditLog.created_at < ts, and_(AuditLog.created_at == ts, AuditLog.id < log_id)))
+        stmt = stmt.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+    return stmt.limit(limit + 1)
+
 @bp.route('/audit')
 @login_required
 @admin_required
 def audit_list():
-    page = request.args.get('page',1,type=int)
-    per_page = 50
-    action = request.args.get('action')
+    action = request.args.get('action') or None
     search = request.args.get('q','').strip()
-    q = AuditLog.query
-    if action:
-        q = q.filter(AuditLog.action==action)
-    if search:
-        like = f"%{search}%"
-        q = q.filter(AuditLog.details.ilike(like) | AuditLog.action.ilike(like) | AuditLog.target_type.ilike(like))
-    q = q.order_by(AuditLog.created_at.desc())
-    pag = q.paginate(page=page, per_page=per_page, error_out=False)
-    actions = db.session.query(AuditLog.action).distinct().all()
-    return render_template('admin/audit_list.html', logs=pag.items, pagination=pag, actions=[a[0] for a in actions], current_action=action, search=search)
+    before = _parse_audit_cursor(request.args.get('before'))
+    after = None if before else _parse_audit_cursor(request.args.get('after'))
+    stmt = _audit_keyset(_audit_filtered(db.select(AuditLog), action, search), before=before, after=after)
+    logs = db.session.execute(stmt).scalars().all()
+    more = len(logs) > AUDIT_PAGE_SIZE
+    logs = logs[:AUDIT_PAGE_SIZE]
+    if after:
+        logs.reverse()
+    page = {
+        'newer': _audit_cursor(logs[0].created_at, logs[0].id) if logs and (before or (after and more)) else None,
+        'older': _audit_cursor(logs[-1].created_at, logs[-1].id) if logs and (more or after) else None,
+    }
+    actions = db.session.execute(db.select(AuditLog.action).distinct().order_by(AuditLog.action)).scalars().all()
+    return render_template('admin/audit_list.html', logs=logs, page=page, actions=actions, current_action=action, search=search)
 
 @bp.route('/api/audit/search')
 @login_required
 @admin_required
 def audit_search_api():
-    limit = min(200, request.args.get('limit', 50, type=int))
+    limit = max(1, min(200, request.args.get('limit', 50, type=int)))
     search = request.args.get('q','').strip()
     action = request.args.get('action')
-    q = AuditLog.query
-    if action:
-        q = q.filter(AuditLog.action==action)
-    if search:
-        like = f"%{search}%"
-        q = q.filter(AuditLog.details.ilike(like) | AuditLog.action.ilike(like) | AuditLog.target_type.ilike(like))
-    rows = q.order_by(AuditLog.created_at.desc()).limit(limit).all()
+    if search and request.args.get('sort') == 'relevance':
+        # Nach Relevanz statt chronologisch (ohne Cursor)
+        stmt = fulltext.ranked(_audit_filtered(db.select(AuditLog), action, None), AuditLog, search).limit(limit)
+        rows = [(r, score) for r, score in db.session.execute(stmt)]
+    else:
+        before = _parse_audit_cursor(request.args.get('before'))
+        stmt = _audit_keyset(_audit_filtered(db.select(AuditLog), action, search), before=before, limit=limit)
+        rows = [(r, None) for r in db.session.execute(stmt).scalars().all()[:limit]]
     return jsonify([
         {
             'id': r.id,
@@ -130,8 +178,10 @@ def audit_search_api():
             'action': r.action,
             'target_type': r.target_type,
             'target_id': r.target_id,
-            'details': r.details[:400] if r.details else None
-        } for r in rows
+            'details': r.details[:400] if r.details else None,
+            'cursor': _audit_cursor(r.created_at, r.id),  # als ?before= für die nächste Seite
+            'score': float(score) if score is not None else None,
+        } for r, score in rows
     ])
 
 @bp.route('/api/users')
@@ -139,14 +189,24 @@ def audit_search_api():
 @admin_required
 def api_users():
     show_deleted = bool(request.args.get('show_deleted'))
-    q = User.query
+    # Zähler als gruppierte Subqueries im selben Statement (statt 3 COUNT-Abfragen pro Benutzer)
+    expenses = _count_per_user(Expense.user_id)
+    photos = _count_per_user(Photo.user_id)
+    sent = _count_per_user(Message.sender_id)
+    q = (db.session.query(User,
+                          func.coalesce(expenses.c.n, 0),
+                          func.coalesce(photos.c.n, 0),
+                          func.coalesce(sent.c.n, 0))
+         .outerjoin(expenses, expenses.c.user_id == User.id)
+         .outerjoin(photos, photos.c.user_id == User.id)
+         .outerjoin(sent, sent.c.user_id == User.id))
     if not show_deleted:
         q = q.filter(User.deleted_at.is_(None))
     search = request.args.get('q','').strip()
     if search:
         like = f"%{search}%"
         q = q.filter(User.username.ilike(like) | User.email.ilike(like))
-    users = q.order_by(User.username.asc()).limit(300).all()
+    rows = q.order_by(User.username.asc()).limit(300).all()
     return jsonify([
         {
             'id': u.id,
@@ -154,12 +214,17 @@ def api_users():
             'email': u.email,
             'is_admin': u.is_admin,
             'deleted_at': u.deleted_at.isoformat() if u.deleted_at else None,
-            'expenses_count': u.expenses.count(),
-            'photos_count': u.photos.count(),
-            'messages_sent': u.messages_sent.count(),
-        } for u in users
+            'expenses_count': n_expenses,
+            'photos_count': n_photos,
+            'messages_sent': n_sent,
+        } for u, n_expenses, n_photos, n_sent in rows
     ])
 
+def _count_per_user(user_column):
+    """Subquery (user_id, n) mit der Anzahl Zeilen pro Benutzer."""
+    return (db.session.query(user_column.label('user_id'), func.count().label('n'))
+            .group_by(user_column).subquery())
+
 @bp.route('/audit/<int:log_id>')
 @login_required
 @admin_required
@@ -185,6 +250,9 @@ def edit_user(user_id):
         old_admin = user.is_admin
         user.is_admin = is_admin_flag
         db.session.commit()
+        user_cache.invalidate(user.id)
+        if email_changed:
+            notification_prefs.invalidate(user.id)  # Dispatcher soll die neue Adresse verwenden
         db.session.add(AuditLog(actor_id=current_user.id, action='edit_user', target_type='user', target_id=str(user.id), details=f"email_changed={email_changed};admin_changed={old_admin}->{user.is_admin}"))
         db.session.commit()
         flash('Benutzer aktualisiert.')
@@ -200,6 +268,7 @@ def toggle_admin(user_id):
     user = User.query.get_or_404(user_id)
     user.is_admin = not user.is_admin
     db.session.commit()
+    user_cache.invalidate(user.id)
     db.session.add(AuditLog(actor_id=current_user.id, action='toggle_admin', target_type='user', target_id=str(user.id), details=f"new_admin={user.is_admin}"))
     db.session.commit()
     flash('Admin-Status geändert.')
@@ -216,6 +285,7 @@ def reset_password(user_id):
     new_pw = ''.join(secrets.choice(alphabet) for _ in range(14))
     user.password_hash = generate_password_hash(new_pw)
     db.session.commit()
+    user_cache.invalidate(user.id)
     # E-Mail Versand (mit einfachem Retry & Diagnose)
     from flask_mail import Message as MailMessage
     from app import mail
@@ -261,6 +331,8 @@ def delete_user(user_id):
     # is_admin zurücksetzen zur Sicherheit
     user.is_admin = False
     db.session.commit()
+    user_cache.invalidate(user.id)
+    notification_prefs.invalidate(user.id)
     db.session.add(AuditLog(actor_id=current_user.id, action='soft_delete_user', target_type='user', target_id=str(user.id), details=f"orig_username={original_username}"))
     db.session.commit()
     flash('Benutzer (soft) gelöscht / anonymisiert.')
@@ -270,40 +342,41 @@ def delete_user(user_id):
 @login_required
 @admin_required
 def export_events_csv():
-    rows = Event.query.order_by(Event.start_time.asc()).all()
-    def generate():
-        yield 'id;title;start;end;all_day;type;important\n'
-        for e in rows:
-            yield f"{e.id};{e.title};{e.start_time.isoformat()};{e.end_time.isoformat()};{int(e.all_day)};{e.event_type or ''};{int(e.is_important)}\n"
-    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition':'attachment; filename=events.csv'})
+    stmt = db.select(Event.id, Event.title, Event.start_time, Event.end_time, Event.all_day, Event.event_type, Event.is_important)\
+        .order_by(Event.start_time.asc())
+    rows = ((id_, title, start.isoformat(), end.isoformat(), int(bool(all_day)), event_type or '', int(bool(important)))
+            for id_, title, start, end, all_day, event_type, important in csv_export.stream_rows(stmt))
+    return csv_export.response('events.csv', ['id', 'title', 'start', 'end', 'all_day', 'type', 'important'], rows)
 
 @bp.route('/export/expenses.csv')
 @login_required
 @admin_required
 def export_expenses_csv():
-    rows = Expense.query.order_by(Expense.date.asc()).all()
-    def generate():
-        yield 'id;amount;description;category;date;user_id\n'
-        for ex in rows:
-            yield f"{ex.id};{ex.amount};{ex.description};{ex.category};{ex.date.isoformat()};{ex.user_id}\n"
-    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition':'attachment; filename=expenses.csv'})
+    stmt = db.select(Expense.id, Expense.amount, Expense.description, Expense.category, Expense.date, Expense.user_id)\
+        .order_by(Expense.date.asc())
+    rows = ((id_, amount, description, category, day.isoformat(), user_id)
+            for id_, amount, description, category, day, user_id in csv_export.stream_rows(stmt))
+    return csv_export.response('expenses.csv', ['id', 'amount', 'description', 'category', 'date', 'user_id'], rows)
 
 @bp.route('/export/audit.csv')
 @login_required
 @admin_required
 def export_audit_csv():
-    q = AuditLog.query.order_by(AuditLog.created_at.desc())
     action = request.args.get('action')
-    if action:
-        q = q.filter(AuditLog.action==action)
-    rows = q.limit(5000).all()  # Hard cap to avoid huge downloads
-    def generate():
-        yield 'id;created_at;actor_id;action;target_type;target_id;details\n'
-        for log in rows:
-            ts = log.created_at.isoformat() if log.created_at else ''
-            details = (log.details or '').replace('\n',' ').replace('\r',' ')
-            yield f"{log.id};{ts};{log.actor_id};{log.action};{log.target_type};{log.target_id};{details}\n"
-    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition':'attachment; filename=audit_logs.csv'})
+    search = request.args.get('q','').strip()
+    def rows():
+        # Vollständiger Export in Keyset-Blöcken: jede Abfrage ist kurz und nutzt den Index
+        cursor = None
+        while True:
+            stmt = db.select(AuditLog.id, AuditLog.created_at, AuditLog.actor_id, AuditLog.action, AuditLog.target_type, AuditLog.target_id, AuditLog.details)
+            batch = db.session.execute(_audit_keyset(_audit_filtered(stmt, action, search), before=cursor, limit=AUDIT_EXPORT_BATCH)).all()
+            for id_, ts, actor_id, act, target_type, target_id, details in batch[:AUDIT_EXPORT_BATCH]:
+                yield id_, ts.isoformat() if ts else '', actor_id, act, target_type, target_id, details or ''
+            if len(batch) <= AUDIT_EXPORT_BATCH:
+                return
+            last = batch[AUDIT_EXPORT_BATCH - 1]
+            cursor = (last.created_at, last.id)
+    return csv_export.response('audit_logs.csv', ['id', 'created_at', 'actor_id', 'action', 'target_type', 'target_id', 'details'], rows())
 
 @bp.route('/system')
 @login_required
@@ -318,13 +391,8 @@ def system_info():
     import platform, os, sys, datetime, re, json
     from flask import current_app
     # Basis Stats
-    stats = {
-        'users_total': db.session.scalar(db.select(func.count(User.id))),
-        'events_total': db.session.scalar(db.select(func.count(Event.id))),
-        'expenses_total': db.session.scalar(db.select(func.count(Expense.id))),
-        'messages_total': db.session.scalar(db.select(func.count(Message.id))),
-        'photos_total': db.session.scalar(db.select(func.count(Photo.id)))
-    }
+    counters = stat_counters.read(current_app._get_current_object())
+    stats = {key: counters[key] for key in ('users_total', 'events_total', 'expenses_total', 'messages_total', 'photos_total')}
     now = datetime.datetime.utcnow()
     uptime_seconds = (now - APP_START).total_seconds()
     # System
@@ -400,7 +468,30 @@ def system_info():
         warnings.append(f"Speichernutzung hoch: {sysinfo['memory_rss_mb']} MB")
     if sysinfo['loadavg'] and sysinfo['loadavg'][0] > 4:
         warnings.append(f"Load hoch: {sysinfo['loadavg'][0]:.2f}")
-    return render_template('admin/system.html', stats=stats, sysinfo=sysinfo, error_logs=error_logs, log_entries=log_entries, warnings=warnings)
+    pool = db_pool.stats(db.engine)
+    if pool['timeouts']:
+        warnings.append(f"DB-Pool erschöpft: {pool['timeouts']} Checkout-Timeouts seit Start")
+    if pool.get('size') and pool['checked_out'] >= pool['size'] + pool['max_overflow']:
+        warnings.append(f"DB-Pool voll belegt: {pool['checked_out']} Verbindungen in Benutzung")
+    endpoints = metrics.snapshot()
+    for row in endpoints:
+        if row['n_plus_one']:
+            warnings.append(f"N+1-Verdacht: {row['endpoint']} ({row['n_plus_one']} Requests, {row['n_plus_one_sample'][0]}× dasselbe Statement)")
+    return render_template('admin/system.html', stats=stats, sysinfo=sysinfo, error_logs=error_logs, log_entries=log_entries, warnings=warnings, pool=pool,
+                           endpoints=endpoints[:30])
+
+@bp.route('/metrics')
+def metrics_export():
+    """Prometheus Text-Format; Admin-Login oder Bearer-Token (METRICS_TOKEN) für Scraper."""
+    import hmac
+    from flask import current_app, abort
+    token = current_app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    by_token = bool(token) and hmac.compare_digest(auth, f'Bearer {token}')
+    if not by_token and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    body = metrics.prometheus(metrics.snapshot(), db_pool.stats(db.engine))
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8', headers={'Cache-Control': 'no-store'})
 
 @bp.route('/system/mail-check', methods=['POST'])
 @login_required
@@ -0,0 +1,181 @@
+"""Fingerprinted static assets.
+
+`flask assets-build` kopiert CSS/JS aus app/static nach app/static/dist/<pfad>.<hash>.<ext>
+(Hash = SHA-256 des Inhalts, 12 Zeichen), legt vorkomprimierte .gz/.br daneben (.br nur mit
+dem optionalen Paket `brotli`) und schreibt dist/manifest.json (logischer Name -> Datei).
+BUNDLES fasst Dateien, die immer zusammen geladen werden, zu einer Datei zusammen.
+
+/sw.js (service_worker) stellt der Datei static/js/sw.js die Precache-Liste (PRECACHE, als URLs
+aus dem Manifest) und eine daraus abgeleitete Cache-Version voran: jeder Asset-Build ergibt einen
+neuen Service Worker, der beim Aktivieren die alten Caches entfernt.
+
+Templates verwenden static_url('js/x.js') bzw. static_urls('css/app.css') für Bundles: mit
+Manifest die fingerprinted Datei (nginx: ein Jahr immutable, gzip_static/brotli_static, siehe
+nginx.conf), ohne Manifest (Entwicklung) die Originaldatei mit ?v=ASSET_VERSION.
+"""
+import os
+import time
+import gzip
+import json
+import hashlib
+import tempfile
+import click
+from flask import current_app, url_for, request
+from app.http_cache import version_token
+
+try:
+    import brotli
+except ImportError:  # optional: ohne brotli nur .gz
+    brotli = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+EXTENSIONS = ('.css', '.js')
+# sw.js muss unter fester URL erreichbar bleiben (/sw.js), Service Worker nie fingerprinten
+EXCLUDE = ('js/sw.js',)
+BUNDLES = {
+    'css/app.css': ('css/enterprise.css', 'css/dashboard.css'),
+}
+# App-Shell für den Service Worker (Assets aus base.html); dazu kommt die Offline-Seite
+PRECACHE = ('css/app.css', 'js/enterprise-ui.js', 'js/socket.io.full.min.js')
+COMPRESS_MIN_BYTES = 512
+DIST_MAX_AGE = 365 * 24 * 3600
+KEEP_OLD_SECONDS = 7 * 24 * 3600
+
+_manifest = None
+_manifest_mtime = None
+
+def init_app(app):
+    app.add_template_global(static_url)
+    app.add_template_global(static_urls)
+
+    @app.after_request
+    def _immutable_dist(resp):
+        # Ohne nginx liefert Flask dist/ selbst aus: gleiche Cache-Header wie dort
+        if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith(DIST + '/') \
+                and resp.status_code == 200:
+            resp.cache_control.public = True
+            resp.cache_control.max_age = DIST_MAX_AGE
+            resp.cache_control.immutable = True
+            resp.cache_control.no_cache = None
+        return resp
+
+    @app.cli.command('assets-build')
+    def assets_build():
+        """Static Assets fingerprinten und vorkomprimieren (app/static/dist)."""
+        manifest = build(app.static_folder)
+        click.echo(f'{len(manifest)} Assets -> {os.path.join(app.static_folder, DIST)}'
+                   + ('' if brotli else ' (ohne .br: Paket brotli fehlt)'))
+
+def _fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+def _write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Eigene Temp-Datei je Schreibvorgang: parallel laufende Builds kommen sich nicht in die Quere
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp legt 0600 an, nginx liefert direkt aus
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _sources(static_folder):
+    for dirpath, dirnames, files in os.walk(static_folder):
+        rel_dir = os.path.relpath(dirpath, static_folder)
+        if rel_dir == DIST or rel_dir.startswith(DIST + os.sep):
+            dirnames[:] = []
+            continue
+        for fname in files:
+            name = os.path.normpath(os.path.join(rel_dir, fname)).replace(os.sep, '/')
+            if name.endswith(EXTENSIONS) and name not in EXCLUDE:
+                yield name
+
+def build(static_folder):
+    """Assets bauen. Rückgabe: Manifest {logischer Name: Pfad unter static/}."""
+    contents = {}
+    for name in _sources(static_folder):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            contents[name] = f.read()
+    for bundle, parts in BUNDLES.items():
+        contents[bundle] = b'\n'.join(contents[p] for p in parts)
+    dist = os.path.join(static_folder, DIST)
+    manifest, keep = {}, {MANIFEST}
+    for name, data in sorted(contents.items()):
+        target = _fingerprint(name, data)
+        manifest[name] = f'{DIST}/{target}'
+        path = os.path.join(dist, target)
+        keep.add(target)
+        if not os.path.isfile(path):  # gleicher Hash = gleicher Inhalt, nichts zu tun
+            _write(path, data)
+        if len(data) < COMPRESS_MIN_BYTES:
+            continue
+        keep.add(target + '.gz')
+        if not os.path.isfile(path + '.gz'):
+            _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            keep.add(target + '.br')
+            if not os.path.isfile(path + '.br'):
+                _write(path + '.br', brotli.compress(data, mode=brotli.MODE_TEXT))
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    # Alte Fingerprints erst nach KEEP_OLD_SECONDS entfernen: offene Seiten und noch nicht
+    # neu gestartete Instanzen verweisen evtl. noch darauf
+    cutoff = time.time() - KEEP_OLD_SECONDS
+    for dirpath, _, files in os.walk(dist):
+        for fname in files:
+            path = os.path.join(dirpath, fname)
+            rel = os.path.relpath(path, dist).replace(os.sep, '/')
+            try:
+                if rel not in keep and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # gleichzeitig von einem anderen Build entfernt
+    return manifest
+
+def _load_manifest():
+    """Manifest lesen; neu geladen, wenn assets-build es ersetzt hat."""
+    global _manifest, _manifest_mtime
+    path = os.path.join(current_app.static_folder, DIST, MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        _manifest, _manifest_mtime = {}, None
+        return _manifest
+    if mtime != _manifest_mtime:
+        with open(path) as f:
+            _manifest = json.load(f)
+        _manifest_mtime = mtime
+    return _manifest
+
+def static_url(filename):
+    """URL eines Static Assets (fingerprinted, falls gebaut)."""
+    built = _load_manifest().get(filename)
+    if built:
+        return url_for('static', filename=built)
+    return url_for('static', filename=filename, v=current_app.config.get('ASSET_VERSION', '1'))
+
+def static_urls(filename):
+    """Wie static_url, für BUNDLES: ungebaut die URLs der Einzeldateien."""
+    if filename in BUNDLES and filename not in _load_manifest():
+        return [static_url(part) for part in BUNDLES[filename]]
+    return [static_url(filename)]
+
+def service_worker():
+    """Antwort für /sw.js: Precache-Liste und Version vor static/js/sw.js."""
+    with open(os.path.join(current_app.static_folder, 'js', 'sw.js'), 'rb') as f:
+        source = f.read()
+    urls = [u for name in PRECACHE for u in static_urls(name)] + [url_for('offline')]
+    version = version_token(hashlib.sha256(source).hexdigest(), *urls)[:12]
+    header = f'const SW_VERSION = {json.dumps(version)};\nconst PRECACHE = {json.dumps(urls)};\n'
+    resp = current_app.response_class(header.encode() + source, mimetype='text/javascript')
+    # Browser prüft /sw.js ohnehin regelmäßig; nie aus dem HTTP-Cache nehmen
+    resp.cache_control.no_cache = True
+    return resp
@@ -0,0 +1,93 @@
+"""Wiederholungsregeln für Kalender-Events (annual, monthly, weekly).
+
+Expandierte Termine werden pro Event und Jahresbereich im Prozess zwischengespeichert,
+damit der Feed (/calendar/events) bei jedem Ansichtswechsel nur noch fertige Instanzen
+zusammenführt. Der Cache-Schlüssel enthält Start/Ende/Regel des Events – ein veraltetes
+Ergebnis (z.B. Änderung durch einen anderen Worker) wird dadurch nie ausgeliefert;
+invalidate() räumt lediglich Speicher auf.
+"""
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+RULES = ('annual', 'monthly', 'weekly')
+
+# Anzahl Events im Cache bzw. unterschiedliche Jahresbereiche pro Event
+_CACHE_MAX_EVENTS = 2000
+_CACHE_MAX_RANGES = 8
+
+_cache = OrderedDict()  # event_id -> {(regel, start, ende, jahr_von, jahr_bis): ((start, ende, suffix), ...)}
+_lock = threading.Lock()
+
+def rule_for(event):
+    """Liefert die Wiederholungsregel eines Events oder None. Geburtstage sind immer jährlich."""
+    if event.event_type == 'birthday':
+        return 'annual'
+    if event.is_recurring and event.recurrence in RULES:
+        return event.recurrence
+    return None
+
+def occurrences(event, year_from, year_to):
+    """Alle Instanzen (start, end, suffix) eines wiederkehrenden Events mit Start in
+    den Jahren year_from..year_to (inklusive). Nicht wiederkehrende Events -> ()."""
+    rule = rule_for(event)
+    if not rule:
+        return ()
+    key = (rule, event.start_time, event.end_time, year_from, year_to)
+    with _lock:
+        per_event = _cache.get(event.id)
+        if per_event is not None:
+            _cache.move_to_end(event.id)
+            hit = per_event.get(key)
+            if hit is not None:
+                return hit
+    result = tuple(_expand(rule, event.start_time, event.end_time, year_from, year_to))
+    with _lock:
+        per_event = _cache.setdefault(event.id, {})
+        if len(per_event) >= _CACHE_MAX_RANGES:
+            per_event.clear()
+        per_event[key] = result
+        _cache.move_to_end(event.id)
+        while len(_cache) > _CACHE_MAX_EVENTS:
+            _cache.popitem(last=False)
+    return result
+
+def invalidate(event_id=None):
+    """Entfernt gecachte Instanzen eines Events (oder aller Events bei None)."""
+    with _lock:
+        if event_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(event_id, None)
+
+def _expand(rule, start, end, year_from, year_to):
+    duration = end - start
+    if rule == 'annual':
+        # Bisheriges Verhalten: jedes Jahr im Bereich, 29.02. fällt in Nicht-Schaltjahren auf den 28.02.
+        for y in range(year_from, year_to + 1):
+            day = start.day
+            if start.month == 2 and day == 29 and not calendar.isleap(y):
+                day = 28
+            new_start = start.replace(year=y, day=day)
+            yield new_start, new_start + duration, y
+    elif rule == 'monthly':
+        # Ab dem ersten Termin; Tage > Monatslänge werden auf den Monatsletzten gelegt
+        y, m = max((year_from, 1), (start.year, start.month))
+        while y <= year_to:
+            day = min(start.day, calendar.monthrange(y, m)[1])
+            new_start = start.replace(year=y, month=m, day=day)
+            yield new_start, new_start + duration, f"{y}{m:02d}"
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    elif rule == 'weekly':
+        range_start = datetime(year_from, 1, 1)
+        range_end = datetime(year_to + 1, 1, 1)
+        current = start
+        if current < range_start:
+            weeks = (range_start - current).days // 7
+            current += timedelta(weeks=weeks)
+            if current < range_start:
+                current += timedelta(weeks=1)
+        while current < range_end:
+            yield current, current + duration, current.strftime('%Y%m%d')
+            current += timedelta(weeks=1)
@@ -1,12 +1,14 @@
 from flask import render_template, jsonify, request
 from flask_login import login_required, current_user
-from app.calendar import bp
+from app.calendar import bp, recurrence
 from app.models import Event
 from app import db, mail
+from app.http_cache import conditional_json
 from flask_mail import Message
 import requests
 from datetime import datetime, timedelta
 from flask import current_app
+from sqlalchemy import and_, or_, func
 
 def _send_event_email(template, subject, user, **context):
     try:
@@ -18,18 +20,42 @@ def _send_event_email(template, subject, user, **context):
         # Leise scheitern (könnte später AuditLog bekommen)
         pass
 
+def _events_in_window(view_start, view_end, user_id=None):
+    """Lädt nur Events, die das Ansichtsfenster [view_start, view_end] überlappen,
+    plus alle wiederkehrenden Events (Geburtstage, annual/monthly/weekly), die ohnehin expandiert werden.
+    Zwei getrennte Abfragen, damit jede ihren Index nutzen kann (ix_event_start_end/ix_event_end_start
+    bzw. event_type/ix_event_recurrence) – ein gemeinsames OR würde zum Full Table Scan führen."""
+    base = Event.query
+    if user_id is not None:
+        base = base.filter(Event.user_id == user_id)
+    recurring = base.filter(or_(Event.event_type == 'birthday',
+                                and_(Event.is_recurring.is_(True), Event.recurrence.in_(recurrence.RULES)))).all()
+    windowed = base.filter(Event.start_time <= view_end, Event.end_time >= view_start).all()
+    merged = {e.id: e for e in recurring}
+    merged.update((e.id, e) for e in windowed)
+    # Reihenfolge wie bisher (Primärschlüssel), damit die Ausgabe stabil bleibt
+    return [merged[k] for k in sorted(merged)]
+
 @bp.route('/')
 @login_required
 def index():
     return render_template('calendar/index.html')
 
+def _events_version():
+    """Versionsteile für das ETag des Feeds: Anzahl, höchste ID, letzte Änderung (ggf. nur eigene Events)."""
+    q = db.session.query(func.count(Event.id), func.max(Event.id), func.max(Event.updated_at))
+    if request.args.get('scope','all') == 'mine':
+        q = q.filter(Event.user_id == current_user.id)
+    return tuple(q.one())
+
 @bp.route('/events')
 @login_required
+@conditional_json(_events_version)
 def get_events():
     """Event Feed.
     Verbesserungen:
       - Zeitzonen-normalisierung (vergleiche naive Datetimes)
-      - Geburtstage/Jahres-Events werden für benötigte Jahre expandiert
+      - Wiederkehrende Events (Geburtstage, annual/monthly/weekly) kommen expandiert aus app.calendar.recurrence
       - Optionaler Parameter scope=mine|all (default: all) für Familien-Kalender
     """
     start_param = request.args.get('start')
@@ -47,10 +73,7 @@ def get_events():
         view_end = view_end.replace(tzinfo=None)
 
     scope = request.args.get('scope','all')
-    if scope == 'mine':
-        events = Event.query.filter_by(user_id=current_user.id).all()
-    else:
-        events = Event.query.all()
+    events = _events_in_window(view_start, view_end, user_id=current_user.id if scope == 'mine' else None)
     out = []
 
     for event in events:
@@ -102,24 +125,14 @@ def get_events():
                 payload['end'] = end_out
             return payload
 
-        # Geburtstage oder explizit jährliche Events expandieren
-        if event.event_type == 'birthday' or (event.is_recurring and event.recurrence == 'annual'):
+        # Wiederkehrende Events (Geburtstage, annual/monthly/weekly) aus dem Occurrence-Cache
+        if recurrence.rule_for(event):
             # Nur benötigte Jahre: von view_start.year bis view_end.year (plus Sicherheitsrand 1 Jahr).
-            years_needed = range(view_start.year - 1, view_end.year + 1)
-            for y in years_needed:
-                try:
-                    new_start = event.start_time.replace(year=y)
-                    new_end = event.end_time.replace(year=y)
-                except ValueError:
-                    if event.start_time.month == 2 and event.start_time.day == 29:  # Leap Day -> 28.
-                        new_start = event.start_time.replace(year=y, day=28)
-                        new_end = event.end_time.replace(year=y, day=28)
-                    else:
-                        continue
+            for new_start, new_end, suffix in recurrence.occurrences(event, view_start.year - 1, view_end.year):
                 # Vergleiche nur Datum, da Geburtstage all-day sind
                 if new_end.date() < view_start.date() or new_start.date() > view_end.date():
                     continue
-                out.append(serialize(new_start, new_end, instance_suffix=y))
+                out.append(serialize(new_start, new_end, instance_suffix=suffix))
         else:
             out.append(serialize(event.start_time, event.end_time))
 
@@ -199,6 +212,7 @@ def create_or_update_event():
     if request.method == 'POST':
         db.session.add(event)
     db.session.commit()
+    recurrence.invalidate(event.id)
     # E-Mail Benachrichtigung
     if old_snapshot is None:
         _send_event_email('emails/event_created.html', 'Neues Ereignis', current_user, event=event)
@@ -237,6 +251,7 @@ def delete_event(event_id):
     title = event.title
     db.session.delete(event)
     db.session.commit()
+    recurrence.invalidate(event_id)
     _send_event_email('emails/event_deleted.html', 'Ereignis gelöscht', current_user, title=title)
     return jsonify({'status': 'success'})
 
@@ -0,0 +1,99 @@
+"""Write-Behind Puffer für Chat-Nachrichten aus Socket.IO (chat_send).
+
+Nachrichten werden gesammelt und von einem Hintergrund-Task in Batches gespeichert:
+ein Commit pro Batch, ChatRoom.last_message_at einmal pro Raum und Batch. Erst nach dem
+Commit (mit echter ID) wird an den Socket.IO Raum 'chat_<room_id>' verteilt, damit
+Clients und /chat/api/messages dieselben IDs sehen.
+"""
+import atexit
+import threading
+from datetime import datetime
+from flask import current_app
+from app import db, socketio
+
+_pending = []
+_lock = threading.Lock()
+_flusher_started = False
+MAX_ATTEMPTS = 3
+
+def room_name(room_id):
+    return f'chat_{room_id}'
+
+def enqueue(app, user_id, username, room_id, content):
+    """Nachricht vormerken (im App-Context eines Socket-Handlers); startet beim ersten Aufruf den Flush-Task."""
+    with _lock:
+        _pending.append({'user_id': user_id, 'username': username, 'room_id': room_id,
+                         'content': content, 'created_at': datetime.utcnow(), 'attempts': 0})
+        size = len(_pending)
+    _ensure_flusher(app)
+    # Bei großen Bursts nicht auf das Intervall warten
+    if size >= app.config.get('CHAT_FLUSH_MAX_BATCH', 50):
+        flush()
+
+def flush():
+    """Speichert alle vorgemerkten Nachrichten in einem Commit und verteilt sie. Benötigt App-Context."""
+    from app.models import ChatMessage, ChatRoom
+    with _lock:
+        batch = list(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+    try:
+        rows = [ChatMessage(user_id=b['user_id'], room_id=b['room_id'], content=b['content'], created_at=b['created_at']) for b in batch]
+        db.session.add_all(rows)
+        last_by_room = {}
+        for b in batch:
+            if b['room_id'] is not None:
+                last_by_room[b['room_id']] = max(last_by_room.get(b['room_id'], b['created_at']), b['created_at'])
+        if last_by_room:
+            for room in ChatRoom.query.filter(ChatRoom.id.in_(list(last_by_room))).all():
+                room.last_message_at = last_by_room[room.id]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        retry = [b for b in batch if b['attempts'] + 1 < MAX_ATTEMPTS]
+        for b in retry:
+            b['attempts'] += 1
+        with _lock:
+            _pending[:0] = retry
+        current_app.logger.exception('Chat-Nachrichten konnten nicht gespeichert werden (%d, erneut: %d)', len(batch), len(retry))
+        return 0
+    for b, m in zip(batch, rows):
+        socketio.emit('chat_message', {
+            'id': m.id,
+            'user_id': m.user_id,
+            'content': m.content,
+            'created_at': m.created_at.isoformat(),
+            'room_id': m.room_id,
+            'username': b['username'],
+        }, to=room_name(m.room_id))
+    return len(rows)
+
+def _ensure_flusher(app):
+    global _flusher_started
+    with _lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    socketio.start_background_task(_flush_loop, app)
+    atexit.register(_flush_on_exit, app)
+
+def _flush_loop(app):
+    interval = app.config.get('CHAT_FLUSH_INTERVAL', 0.25)
+    while True:
+        socketio.sleep(interval)
+        if not _pending:
+            continue
+        with app.app_context():
+            try:
+                flush()
+            except Exception:
+                # Der Task muss weiterlaufen, sonst bleiben neue Nachrichten liegen
+                app.logger.exception('Chat-Flush fehlgeschlagen')
+            finally:
+                db.session.remove()
+
+def _flush_on_exit(app):  # pragma: no cover - Prozessende
+    if _pending:
+        with app.app_context():
+            flush()
@@ -2,9 +2,13 @@ from flask import render_template, request, jsonify
 from flask_login import login_required, current_user
 from app.chat import bp
 from app import db
-from app.models import ChatMessage, ChatRoom, AuditLog
+from app.http_cache import conditional_json
+from sqlalchemy import func
+from app.models import ChatMessage, ChatRoom, AuditLog, User
 from datetime import datetime
 
+MESSAGES_PAGE_MAX = 200
+
 @bp.route('/')
 @login_required
 def index():
@@ -20,18 +24,60 @@ def index():
         active_room = rooms[0]
     return render_template('chat/index.html', rooms=rooms, active_room=active_room)
 
+def _messages_version():
+    q = db.session.query(func.count(ChatMessage.id), func.max(ChatMessage.id))
+    room_id = request.args.get('room', type=int)
+    if room_id:
+        q = q.filter(ChatMessage.room_id==room_id)
+    return tuple(q.one())
+
 @bp.route('/api/messages')
 @login_required
+@conditional_json(_messages_version)
 def api_messages():
+    """Chat-Verlauf mit Keyset-Pagination.
+    - ohne Cursor: die letzten `limit` Nachrichten
+    - after_id: Nachrichten nach dieser ID (Nachholen nach Reconnect)
+    - before_id: ältere Nachrichten vor dieser ID (Scrollen nach oben)
+    Ausgabe immer aufsteigend nach ID; Username per Join statt Lazy Load je Zeile.
+    """
     room_id = request.args.get('room', type=int)
-    q = ChatMessage.query
+    after_id = request.args.get('after_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    limit = max(1, min(MESSAGES_PAGE_MAX, request.args.get('limit', MESSAGES_PAGE_MAX, type=int)))
+    q = db.session.query(ChatMessage, User.username).outerjoin(User, User.id==ChatMessage.user_id)
     if room_id:
         q = q.filter(ChatMessage.room_id==room_id)
     if not current_user.is_admin:
         # Admin-only Räume ausfiltern
         q = q.join(ChatRoom, ChatRoom.id==ChatMessage.room_id).filter((ChatRoom.is_admin_only.is_(False)) | (ChatRoom.is_admin_only.is_(None)))
-    rows = q.order_by(ChatMessage.id.desc()).limit(200).all()[::-1]
-    return jsonify([{ 'id':m.id,'user_id':m.user_id,'content':m.content,'created_at':m.created_at.isoformat(),'room_id':m.room_id,'username':m.sender.username if m.sender else None } for m in rows])
+    if after_id is not None:
+        rows = q.filter(ChatMessage.id > after_id).order_by(ChatMessage.id.asc()).limit(limit).all()
+    else:
+        if before_id is not None:
+            q = q.filter(ChatMessage.id < before_id)
+        rows = q.order_by(ChatMessage.id.desc()).limit(limit).all()[::-1]
+    return jsonify([{ 'id':m.id,'user_id':m.user_id,'content':m.content,'created_at':m.created_at.isoformat(),'room_id':m.room_id,'username':username } for m, username in rows])
+
+SEARCH_LIMIT_MAX = 50
+
+@bp.route('/api/search')
+@login_required
+def api_search():
+    """Volltextsuche im Chat (app.search), nach Relevanz sortiert; optional auf einen Raum begrenzt."""
+    from app import search
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error':'q required'}),400
+    room_id = request.args.get('room', type=int)
+    limit = max(1, min(SEARCH_LIMIT_MAX, request.args.get('limit', 20, type=int)))
+    stmt = db.select(ChatMessage, User.username).outerjoin(User, User.id==ChatMessage.user_id)
+    if room_id:
+        stmt = stmt.filter(ChatMessage.room_id==room_id)
+    if not current_user.is_admin:
+        stmt = stmt.join(ChatRoom, ChatRoom.id==ChatMessage.room_id).filter((ChatRoom.is_admin_only.is_(False)) | (ChatRoom.is_admin_only.is_(None)))
+    rows = db.session.execute(search.ranked(stmt, ChatMessage, query).limit(limit)).all()
+    return jsonify([{ 'id':m.id,'user_id':m.user_id,'content':m.content,'created_at':m.created_at.isoformat(),'room_id':m.room_id,'username':username,'score':float(score) } for m, username, score in rows])
 
 @bp.route('/api/rooms', methods=['POST'])
 @login_required
@@ -626,10 +672,12 @@ def budgets():
 @bp.route('/api/export.csv')
 @login_required
 def export_csv():
+    from app.models import Expense  # lazy import
+    from app import csv_export
     kind = request.args.get('kind')
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
-    q = Expense.query
+    q = db.select(Expense.date, Expense.kind, Expense.category, Expense.amount, Expense.description, Expense.user_id)
     if current_user.is_admin:
         user_id_param = request.args.get('user_id', type=int)
         if user_id_param:
@@ -643,14 +691,9 @@ def export_csv():
     if month:
         q = q.filter(func.extract('month', Expense.date)==month)
     q = q.order_by(Expense.date.asc())
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
-    writer.writerow(['Datum','Art','Kategorie','Betrag','Beschreibung','UserID'])
-    for e in q.all():
-        val = e.amount if e.kind=='income' else -e.amount
-        writer.writerow([e.date.isoformat(), e.kind, e.category, f"{val:.2f}", e.description, e.user_id])
-    csv_data = output.getvalue()
-    return Response(csv_data, mimetype='text/csv', headers={'Content-Disposition':'attachment; filename=finanzen_export.csv'})
+    rows = ((day.isoformat(), k, category, f"{amount if k=='income' else -amount:.2f}", description, user_id)
+            for day, k, category, amount, description, user_id in csv_export.stream_rows(q))
+    return csv_export.response('finanzen_export.csv', ['Datum','Art','Kategorie','Betrag','Beschreibung','UserID'], rows)
 
 # ---------------- Overview / Dashboard Metrics -----------------
 @bp.route('/api/accounts/overview')
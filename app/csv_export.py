@@ -0,0 +1,64 @@
+"""Gestreamte CSV-Exporte.
+
+Die Abfrage läuft mit yield_per (setzt stream_results: serverseitiger Cursor, bei PyMySQL
+SSCursor) und liefert die Zeilen in Blöcken von YIELD_PER statt alle auf einmal zu laden.
+Jede Zeile geht durch csv.writer (Quoting von Trennzeichen, Anführungszeichen und
+Zeilenumbrüchen in Texten); ausgegeben wird in Blöcken von etwa CHUNK_SIZE Zeichen.
+Mit ?gzip=1 wird on-the-fly komprimiert (Download als .csv.gz). Der Speicherbedarf
+ist damit unabhängig von der Zahl der Zeilen.
+"""
+import csv
+import io
+import zlib
+from flask import Response, request, stream_with_context
+from app import db
+
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+DELIMITER = ';'
+
+def stream_rows(stmt, batch=YIELD_PER):
+    """Ergebniszeilen von `stmt` blockweise über einen serverseitigen Cursor."""
+    result = db.session.execute(stmt.execution_options(yield_per=batch))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+def _csv_chunks(header, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=DELIMITER, lineterminator='\n')
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip-Header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def wants_gzip():
+    return request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+def response(filename, header, rows, gzip=None):
+    """Streaming-Response für einen CSV-Download; `rows` ist ein Iterator von Zeilen (Sequenzen)."""
+    if gzip is None:
+        gzip = wants_gzip()
+    chunks = _csv_chunks(header, rows)
+    if gzip:
+        body, mimetype, filename = _gzip_chunks(chunks), 'application/gzip', filename + '.gz'
+    else:
+        body, mimetype = chunks, 'text/csv'
+    resp = Response(stream_with_context(body), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # nginx soll nicht die ganze Antwort puffern
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
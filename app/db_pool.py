@@ -0,0 +1,90 @@
+"""Connection Pool für MySQL: Konfiguration und Kennzahlen.
+
+engine_options() baut SQLALCHEMY_ENGINE_OPTIONS aus DB_POOL_* (Umgebung):
+  - pool_pre_ping: tote Verbindungen (MySQL wait_timeout über Nacht, Server-Neustart) werden vor
+    der Verwendung erkannt und ersetzt statt als "MySQL server has gone away" beim Benutzer zu landen
+  - pool_recycle: Verbindungen werden vor Ablauf von wait_timeout erneuert
+  - pool_size/max_overflow: Standard nach Worker-Modell – ein eventlet/gevent Worker bedient viele
+    Requests und Socket.IO Verbindungen gleichzeitig in einem Prozess, braucht also mehr Verbindungen
+    als ein threading-Prozess
+MeteredQueuePool zählt Checkouts, Wartezeit beim Checkout, Timeouts (Pool erschöpft) und
+invalidierte Verbindungen; stats() liefert die Werte für /admin/system.
+"""
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+from app.socketio_queue import detect_async_mode
+
+# (pool_size, max_overflow) je async_mode
+DEFAULT_SIZES = {'eventlet': (10, 20), 'gevent': (10, 20), 'threading': (5, 10)}
+
+_lock = threading.Lock()
+_stats = {'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'slow_checkouts': 0, 'timeouts': 0,
+          'connects': 0, 'invalidated': 0, 'last_invalidated': None, 'last_timeout': None}
+SLOW_CHECKOUT_SECONDS = 0.1
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool mit Messung der Wartezeit pro Checkout (inkl. Aufbau neuer Verbindungen)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            with _lock:
+                _stats['timeouts'] += 1
+                _stats['last_timeout'] = time.time()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _lock:
+                _stats['checkouts'] += 1
+                _stats['wait_total'] += waited
+                if waited > _stats['wait_max']:
+                    _stats['wait_max'] = waited
+                if waited > SLOW_CHECKOUT_SECONDS:
+                    _stats['slow_checkouts'] += 1
+
+@event.listens_for(MeteredQueuePool, 'connect')
+def _on_connect(dbapi_conn, record):
+    with _lock:
+        _stats['connects'] += 1
+
+@event.listens_for(MeteredQueuePool, 'invalidate')
+@event.listens_for(MeteredQueuePool, 'soft_invalidate')
+def _on_invalidate(dbapi_conn, record, exception):
+    with _lock:
+        _stats['invalidated'] += 1
+        _stats['last_invalidated'] = time.time()
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS für die konfigurierte Datenbank (SQLite bleibt beim Standard-Pool)."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if uri.startswith('sqlite'):
+        return {}
+    size, overflow = DEFAULT_SIZES.get(detect_async_mode(config.get('SOCKETIO_ASYNC_MODE')), DEFAULT_SIZES['threading'])
+    return {
+        'poolclass': MeteredQueuePool,
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE') or 280,
+        'pool_size': config.get('DB_POOL_SIZE') or size,
+        'max_overflow': config.get('DB_MAX_OVERFLOW') if config.get('DB_MAX_OVERFLOW') is not None else overflow,
+        'pool_timeout': config.get('DB_POOL_TIMEOUT') or 10,
+    }
+
+def stats(engine):
+    """Kennzahlen des Pools von `engine` (Zähler seit Prozessstart)."""
+    with _lock:
+        data = dict(_stats)
+    pool = engine.pool
+    data['pool_class'] = type(pool).__name__
+    data['wait_avg_ms'] = round(data['wait_total'] / data['checkouts'] * 1000, 2) if data['checkouts'] else 0.0
+    data['wait_max_ms'] = round(data.pop('wait_max') * 1000, 2)
+    data.pop('wait_total')
+    if isinstance(pool, QueuePool):
+        data.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                    overflow=max(pool.overflow(), 0), max_overflow=pool._max_overflow,
+                    timeout=pool.timeout(), recycle=pool._recycle, pre_ping=pool._pre_ping)
+    return data
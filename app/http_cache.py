@@ -0,0 +1,39 @@
+"""Bedingte HTTP-Antworten (ETag / If-None-Match) für JSON-Feeds.
+
+Jeder Feed liefert eine billige Versions-Funktion (z.B. COUNT + MAX(id) + MAX(updated_at)
+des betroffenen Ausschnitts). Daraus wird pro Endpoint, Benutzer und Query-String ein
+schwaches ETag gebildet. Stimmt es mit If-None-Match des Clients überein, wird 304 ohne
+Body geantwortet – der eigentliche Feed (Abfrage + Serialisierung) läuft dann gar nicht.
+"""
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+
+def version_token(*parts):
+    """Stabiler, kurzer Hash über beliebige Versionsbestandteile."""
+    raw = '|'.join('' if p is None else (p.isoformat() if hasattr(p, 'isoformat') else str(p)) for p in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+def _request_etag(version):
+    user_part = (current_user.id, current_user.is_admin) if current_user.is_authenticated else ('anon',)
+    return version_token(request.endpoint, request.query_string.decode('latin-1'), *user_part, *version)
+
+def conditional_json(version_fn):
+    """Decorator für JSON-Endpoints: version_fn(**view_args) liefert ein Tupel von Versionsteilen."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = _request_etag(version_fn(*args, **kwargs))
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response('', 304)
+            else:
+                resp = make_response(f(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            # Browser darf speichern, muss aber immer revalidieren (Daten sind benutzerspezifisch)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return wrapper
+    return decorator
@@ -0,0 +1,176 @@
+"""Bildverarbeitung für Foto- und Avatar-Uploads außerhalb des Request-Threads.
+
+Der Upload speichert nur das Original und reicht einen Job ein; imaging.process_image läuft
+in einem ProcessPoolExecutor (IMAGE_WORKERS Prozesse, 'spawn' – kein Fork des Worker-Prozesses
+mit offenen Sockets/DB-Verbindungen bzw. Eventlet-Hub). Das Ergebnis (Breite, Höhe, Bytes,
+Status) wird im Callback auf Photo gespeichert. IMAGE_WORKERS=0 verarbeitet synchron (Entwicklung).
+
+Fehlen Derivate (Fotos von vor der Umstellung), reicht /photos/thumb über ensure_derivatives()
+höchstens einen Job je Foto ein; `flask images-backfill` holt alle auf einmal nach.
+"""
+import os
+import multiprocessing
+import threading
+import click
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from app import db, imaging, storage
+from app.models import Photo
+
+STALE_AFTER = timedelta(minutes=5)
+
+_executor = None
+_lock = threading.Lock()
+
+def init_app(app):
+    @app.cli.command('images-backfill')
+    @click.option('--retry-failed', is_flag=True, help="Auch Fotos mit Status 'failed' erneut verarbeiten.")
+    def images_backfill(retry_failed):
+        """Fehlende Derivate (Altbestand) und liegengebliebene Fotos verarbeiten."""
+        n = backfill(app, retry_failed=retry_failed)
+        click.echo(f'{n} Fotos eingereicht, warte auf die Verarbeitung ...')
+        wait(app)
+        click.echo('fertig')
+
+def _pool(app):
+    """Pool beim ersten Job anlegen. Rückgabe (pool, neu angelegt)."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            return _executor, False
+        _executor = ProcessPoolExecutor(max_workers=app.config.get('IMAGE_WORKERS', 2),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _executor, True
+
+def _run(app, args, on_done):
+    """Job ausführen; Rückgabe True, wenn dafür der Pool neu angelegt wurde."""
+    if not app.config.get('IMAGE_WORKERS', 2):
+        try:
+            result, error = imaging.process_image(*args), None
+        except Exception as e:
+            result, error = None, e
+        on_done(result, error)
+        return False
+    pool, fresh = _pool(app)
+    try:
+        future = pool.submit(imaging.process_image, *args)
+    except BrokenProcessPool:
+        # Ein Worker ist abgestürzt (z.B. OOM bei riesigem Bild) -> Pool neu anlegen
+        _discard(pool)
+        pool, fresh = _pool(app)
+        future = pool.submit(imaging.process_image, *args)
+    future.add_done_callback(lambda fut: on_done(*_outcome(fut)))
+    return fresh
+
+def _discard(pool):
+    global _executor
+    with _lock:
+        if _executor is pool:
+            _executor = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _outcome(future):
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+def submit_photo(app, photo_id, directory, fname, resubmit=True):
+    """Foto verarbeiten; beim ersten Job nach dem Start werden liegengebliebene Fotos nachgeholt."""
+    def done(result, error):
+        with app.app_context():
+            try:
+                photo = db.session.get(Photo, photo_id)
+                if photo is None:  # inzwischen gelöscht
+                    if not os.path.isfile(os.path.join(directory, fname)):  # Datei auch von keinem anderen Foto genutzt
+                        imaging.remove_derivatives(directory, fname)
+                    return
+                if error is not None:
+                    app.logger.warning('Bildverarbeitung für Foto %s fehlgeschlagen: %r', photo_id, error)
+                    photo.processing_state = 'failed'
+                else:
+                    photo.width = result['width']
+                    photo.height = result['height']
+                    photo.bytes = result['bytes']
+                    photo.processing_state = 'ready'
+                photo.processed_at = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error('Ergebnis der Bildverarbeitung für Foto %s nicht gespeichert: %r', photo_id, e)
+    if _run(app, (directory, fname), done) and resubmit:
+        resubmit_stale(app, exclude={photo_id})
+
+def submit_avatar(app, directory, fname, sizes):
+    def done(result, error):
+        if error is not None:
+            app.logger.warning('Bildverarbeitung für Avatar %s fehlgeschlagen: %r', fname, error)
+    _run(app, (directory, fname, sizes), done)
+
+def resubmit_stale(app, exclude=()):
+    """Fotos, die länger als STALE_AFTER auf 'pending' stehen, erneut einreichen."""
+    with app.app_context():
+        cutoff = datetime.utcnow() - STALE_AFTER
+        jobs = [(p.id, storage.dir_for('photos', p.filename), p.filename)
+                for p in Photo.query.filter(Photo.processing_state == 'pending', Photo.created_at < cutoff).all()
+                if p.id not in exclude]
+    for photo_id, directory, fname in jobs:
+        submit_photo(app, photo_id, directory, fname, resubmit=False)
+
+def _has_derivatives(directory, fname):
+    return all(os.path.isfile(os.path.join(directory, imaging.derivative_name(fname, size, fmt)))
+               for size in imaging.SIZES for fmt in imaging.FORMATS)
+
+def ensure_derivatives(app, fname):
+    """Fehlende Derivate zu `fname` im Hintergrund erzeugen lassen (im App-Context des Requests).
+
+    Höchstens ein Job je Foto: der Wechsel 'ready' -> 'pending' ist ein bedingtes UPDATE, nur wer
+    ihn durchführt, reicht ein. Läuft schon ein Job oder ist die Verarbeitung fehlgeschlagen
+    ('failed'), passiert nichts. Rückgabe True, wenn ein Job eingereicht wurde.
+    """
+    states = dict(db.session.query(Photo.id, Photo.processing_state).filter(Photo.filename == fname).all())
+    ready = sorted(pid for pid, state in states.items() if state == 'ready')
+    if not ready or 'pending' in states.values():
+        return False
+    photo_id = ready[0]
+    claimed = Photo.query.filter(Photo.id == photo_id, Photo.processing_state == 'ready').update(
+        {Photo.processing_state: 'pending'}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return False
+    submit_photo(app, photo_id, storage.dir_for('photos', fname), fname)
+    return True
+
+def backfill(app, retry_failed=False):
+    """Fotos ohne (vollständige) Derivate, liegengebliebene und optional fehlgeschlagene einreichen
+    (je Datei ein Job). Rückgabe: Anzahl Jobs."""
+    states = ['ready', 'pending'] + (['failed'] if retry_failed else [])
+    with app.app_context():
+        cutoff = datetime.utcnow() - STALE_AFTER
+        jobs, seen = [], set()
+        for p in Photo.query.filter(Photo.processing_state.in_(states)).order_by(Photo.id.asc()).all():
+            if p.filename in seen:
+                continue
+            directory = storage.dir_for('photos', p.filename)
+            if not os.path.isfile(os.path.join(directory, p.filename)):
+                continue
+            if p.processing_state == 'ready' and _has_derivatives(directory, p.filename):
+                continue
+            if p.processing_state == 'pending' and p.created_at and p.created_at >= cutoff:
+                continue  # läuft vermutlich gerade
+            seen.add(p.filename)
+            p.processing_state = 'pending'
+            jobs.append((p.id, directory, p.filename))
+        db.session.commit()
+    for photo_id, directory, fname in jobs:
+        submit_photo(app, photo_id, directory, fname, resubmit=False)
+    return len(jobs)
+
+def wait(app):
+    """Auf alle eingereichten Jobs warten (CLI); der Pool wird dabei beendet."""
+    global _executor
+    with _lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        pool.shutdown(wait=True)
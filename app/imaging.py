@@ -0,0 +1,100 @@
+"""Verkleinerte Varianten (Derivate) für hochgeladene Bilder.
+
+Zu jedem Original <stem>.<ext> entstehen im selben Verzeichnis <stem>.<größe>.webp und
+<stem>.<größe>.jpg für jede Kantenlänge aus SIZES (längste Seite, nie vergrößert).
+EXIF-Orientierung wird angewendet, Metadaten werden nicht übernommen.
+
+process_image() ist der vollständige Verarbeitungsschritt (läuft in app.image_jobs in einem
+eigenen Prozess): Original drehen und von Metadaten (EXIF/GPS) befreien, Derivate erzeugen,
+Maße und Größe zurückgeben. Die Funktionen hier hängen nicht von Flask ab.
+"""
+import os
+import tempfile
+from PIL import Image, ImageOps
+
+SIZES = (256, 1024)
+FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}  # Pillow-Format -> Dateiendung
+MIMETYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+STRIP_FORMATS = {'JPEG': {'quality': 92, 'optimize': True}, 'PNG': {'optimize': True}, 'WEBP': {'quality': 90}}
+
+def _save_replace(target, save):
+    """save(tmp_pfad) in eine eindeutige Temp-Datei neben `target` schreiben und atomar ersetzen.
+    Eindeutig, weil zwei Jobs für denselben (deduplizierten) Inhalt gleichzeitig laufen können."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.', suffix='.tmp')
+    os.close(fd)
+    try:
+        save(tmp)
+        os.chmod(tmp, 0o644)  # mkstemp legt 0600 an; nginx liefert per X-Accel-Redirect aus
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _stem(fname):
+    return fname.rsplit('.', 1)[0]
+
+def derivative_name(fname, size, fmt):
+    return f'{_stem(fname)}.{size}.{FORMATS[fmt]}'
+
+def make_derivatives(directory, fname, sizes=SIZES):
+    """Erzeugt alle Derivate zu `fname` in `directory`. Rückgabe: Liste der Dateinamen."""
+    created = []
+    with Image.open(os.path.join(directory, fname)) as im:
+        im = ImageOps.exif_transpose(im)
+        has_alpha = im.mode in ('RGBA', 'LA') or (im.mode == 'P' and 'transparency' in im.info)
+        base = im.convert('RGBA' if has_alpha else 'RGB')
+        for size in sorted(sizes, reverse=True):
+            # Von der größeren Variante weiter verkleinern spart Rechenzeit
+            base.thumbnail((size, size), Image.LANCZOS)
+            for fmt in FORMATS:
+                name = derivative_name(fname, size, fmt)
+                target = os.path.join(directory, name)
+                if fmt == 'jpeg':
+                    frame = base.convert('RGB') if base.mode != 'RGB' else base
+                    _save_replace(target, lambda tmp: frame.save(tmp, 'JPEG', quality=82, optimize=True, progressive=True))
+                else:
+                    _save_replace(target, lambda tmp: base.save(tmp, 'WEBP', quality=80, method=4))
+                created.append(name)
+    return created
+
+def remove_derivatives(directory, fname, sizes=SIZES):
+    for size in sizes:
+        for fmt in FORMATS:
+            try:
+                os.remove(os.path.join(directory, derivative_name(fname, size, fmt)))
+            except FileNotFoundError:
+                pass
+
+def strip_metadata(path):
+    """Original gedreht und ohne EXIF/XMP neu schreiben (ICC-Profil bleibt). Animierte Bilder bleiben unverändert."""
+    with Image.open(path) as im:
+        fmt = im.format
+        if fmt not in STRIP_FORMATS or getattr(im, 'is_animated', False):
+            return False
+        if not (im.info.get('exif') or im.getexif() or im.info.get('xmp') or 'XML:com.adobe.xmp' in im.info):
+            return False
+        icc = im.info.get('icc_profile')
+        out = ImageOps.exif_transpose(im)
+        if fmt == 'JPEG' and out.mode not in ('RGB', 'L', 'CMYK'):
+            out = out.convert('RGB')
+        options = dict(STRIP_FORMATS[fmt])
+        if icc:
+            options['icc_profile'] = icc
+        _save_replace(path, lambda tmp: out.save(tmp, fmt, **options))
+    return True
+
+def process_image(directory, fname, sizes=SIZES, strip=True):
+    """Kompletter Verarbeitungsschritt für ein hochgeladenes Bild. Rückgabe: dict mit
+    width, height, bytes (des bereinigten Originals) und derivatives."""
+    path = os.path.join(directory, fname)
+    if strip:
+        strip_metadata(path)
+    with Image.open(path) as im:
+        width, height = im.size
+        if im.getexif().get(0x0112) in (5, 6, 7, 8):  # um 90° gedreht gespeichert
+            width, height = height, width
+    derivatives = make_derivatives(directory, fname, sizes)
+    return {'width': width, 'height': height, 'bytes': os.path.getsize(path), 'derivatives': derivatives}
@@ -1,6 +1,6 @@
 from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, notification_prefs, push_sender
 from app.models import PushSubscription
 from datetime import datetime
 import json
@@ -21,45 +21,35 @@ def subscribe():
     if not endpoint or 'p256dh' not in keys or 'auth' not in keys:
         return jsonify({'error':'invalid subscription'}),400
     sub = PushSubscription.query.filter_by(endpoint=endpoint).first()
+    previous_owner = None
     if not sub:
         sub = PushSubscription(user_id=current_user.id, endpoint=endpoint, p256dh=keys['p256dh'], auth=keys['auth'])
         db.session.add(sub)
     else:
+        previous_owner = sub.user_id
         sub.user_id = current_user.id
         sub.p256dh = keys['p256dh']
         sub.auth = keys['auth']
         sub.last_used_at = datetime.utcnow()
     db.session.commit()
+    notification_prefs.invalidate(current_user.id)
+    if previous_owner and previous_owner != current_user.id:
+        notification_prefs.invalidate(previous_owner)
     return jsonify({'status':'ok'})
 
 @bp_push.route('/push/test', methods=['POST'])
 @login_required
 def test_push():
     # send simple push to current user
-    from pywebpush import webpush, WebPushException
-    subs = PushSubscription.query.filter_by(user_id=current_user.id).all()
-    sent = 0
-    errors = []
+    subs = notification_prefs.get(current_user.id)['push']
     payload = json.dumps({'title':'Test Push','body':'Hallo von Family Portal','url':'/'})
     vapid_private = current_app.config.get('VAPID_PRIVATE_KEY')
     vapid_public = current_app.config.get('VAPID_PUBLIC_KEY')
-    claim_email = current_app.config.get('VAPID_CLAIM_EMAIL')
     if not vapid_private or not vapid_public:
         return jsonify({'error':'VAPID keys missing'}),500
-    for s in subs:
-        try:
-            webpush(
-                subscription_info={
-                    'endpoint': s.endpoint,
-                    'keys': {'p256dh': s.p256dh, 'auth': s.auth}
-                },
-                data=payload,
-                vapid_private_key=vapid_private,
-                vapid_claims={'sub': f'mailto:{claim_email}'}
-            )
-            s.last_used_at = datetime.utcnow()
-            sent +=1
-        except WebPushException as e:
-            errors.append(str(e))
-    db.session.commit()
-    return jsonify({'sent':sent,'errors':errors})
+    res = push_sender.send(subs, payload)
+    if res['sent']:
+        PushSubscription.query.filter(PushSubscription.id.in_(res['sent'])).update({'last_used_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+    removed = push_sender.prune(res['gone'])
+    return jsonify({'sent':len(res['sent']),'removed':removed,'errors':res['errors']})
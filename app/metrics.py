@@ -0,0 +1,163 @@
+"""Latenz- und SQL-Kennzahlen pro Endpoint.
+
+Pro Request werden Dauer, Anzahl und Dauer der SQL-Statements (Engine-Events
+before/after_cursor_execute) erfasst und pro Endpoint aufsummiert: Latenz-Histogramm
+(BUCKETS_MS), Summen, Maximum. Wird dasselbe Statement in einem Request mindestens
+N_PLUS_ONE_THRESHOLD-mal ausgeführt (typisch: Abfrage pro Zeile in einer Schleife),
+zählt der Request als N+1-Verdacht; das Statement wird als Beispiel gemerkt.
+
+Ausgabe: /admin/metrics (Prometheus Text-Format, Admin-Login oder Bearer METRICS_TOKEN),
+Tabelle auf /admin/system, Server-Timing-Header für die Browser-Devtools.
+Die Werte sind prozesslokal und zählen ab Prozessstart.
+"""
+import threading
+import time
+from collections import Counter
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+N_PLUS_ONE_THRESHOLD = 10
+UNMATCHED = '<unmatched>'
+
+_lock = threading.Lock()
+_endpoints = {}  # endpoint -> dict (siehe _new_entry)
+
+def _new_entry():
+    return {'count': 0, 'errors': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(BUCKETS_MS) + 1),
+            'sql_count': 0, 'sql_ms': 0.0, 'sql_max': 0, 'n_plus_one': 0, 'n_plus_one_sample': None}
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_teardown)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    # Startzeit am ExecutionContext statt in conn.info: wirft das Statement, verschwindet sie mit ihm
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_start', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if not has_app_context():
+        return
+    req = g.get('_metrics')
+    if req is None:
+        return
+    req['sql_count'] += 1
+    req['sql_s'] += elapsed
+    req['statements'][statement] += 1
+
+def _start():
+    g._metrics = {'start': time.perf_counter(), 'sql_count': 0, 'sql_s': 0.0, 'statements': Counter()}
+
+def _finish(resp):
+    req = g.get('_metrics')
+    if req is not None:
+        total_ms = _record(req, resp.status_code)
+        resp.headers.add('Server-Timing', f'app;dur={total_ms:.1f}, db;dur={req["sql_s"] * 1000:.1f};desc="{req["sql_count"]} queries"')
+    return resp
+
+def _teardown(exc):
+    # Unbehandelte Ausnahme: after_request lief nicht
+    req = g.pop('_metrics', None)
+    if req is not None and not req.get('recorded'):
+        _record(req, 500)
+
+def _record(req, status):
+    req['recorded'] = True
+    total_ms = (time.perf_counter() - req['start']) * 1000
+    statement, repeats = req['statements'].most_common(1)[0] if req['statements'] else (None, 0)
+    endpoint = request.endpoint or UNMATCHED
+    bucket = next((i for i, le in enumerate(BUCKETS_MS) if total_ms <= le), len(BUCKETS_MS))
+    with _lock:
+        e = _endpoints.get(endpoint)
+        if e is None:
+            e = _endpoints[endpoint] = _new_entry()
+        e['count'] += 1
+        e['errors'] += status >= 500
+        e['sum_ms'] += total_ms
+        e['max_ms'] = max(e['max_ms'], total_ms)
+        e['buckets'][bucket] += 1
+        e['sql_count'] += req['sql_count']
+        e['sql_ms'] += req['sql_s'] * 1000
+        e['sql_max'] = max(e['sql_max'], req['sql_count'])
+        if repeats >= N_PLUS_ONE_THRESHOLD:
+            e['n_plus_one'] += 1
+            e['n_plus_one_sample'] = (repeats, ' '.join(statement.split())[:300])
+    return total_ms
+
+def _percentile(buckets, count, q):
+    """Obergrenze des Buckets, in dem das q-Quantil liegt (None = über dem größten Bucket)."""
+    if not count:
+        return 0
+    target = q * count
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+    return None
+
+def snapshot():
+    """Kennzahlen je Endpoint (Kopie), nach Gesamtzeit absteigend."""
+    with _lock:
+        data = {k: dict(v, buckets=list(v['buckets'])) for k, v in _endpoints.items()}
+    rows = []
+    for endpoint, e in data.items():
+        n = e['count']
+        rows.append({
+            'endpoint': endpoint, 'count': n, 'errors': e['errors'],
+            'avg_ms': round(e['sum_ms'] / n, 1), 'p95_ms': _percentile(e['buckets'], n, 0.95),
+            'max_ms': round(e['max_ms'], 1), 'total_s': round(e['sum_ms'] / 1000, 2),
+            'sql_avg': round(e['sql_count'] / n, 1), 'sql_max': e['sql_max'],
+            'sql_avg_ms': round(e['sql_ms'] / n, 1), 'n_plus_one': e['n_plus_one'],
+            'n_plus_one_sample': e['n_plus_one_sample'], 'buckets': e['buckets'], 'sum_ms': e['sum_ms'],
+            'sql_count': e['sql_count'], 'sql_ms': e['sql_ms'],
+        })
+    rows.sort(key=lambda r: r['sum_ms'], reverse=True)
+    return rows
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def prometheus(rows, pool=None):
+    """Text-Exposition (Prometheus 0.0.4) aus snapshot() und optional db_pool.stats()."""
+    out = ['# HELP http_request_duration_seconds Request-Dauer pro Endpoint.',
+           '# TYPE http_request_duration_seconds histogram']
+    for r in rows:
+        ep = _label(r['endpoint'])
+        cumulative = 0
+        for le, n in zip(BUCKETS_MS, r['buckets']):
+            cumulative += n
+            out.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="{le / 1000:g}"}} {cumulative}')
+        out.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="+Inf"}} {r["count"]}')
+        out.append(f'http_request_duration_seconds_sum{{endpoint="{ep}"}} {r["sum_ms"] / 1000:.6f}')
+        out.append(f'http_request_duration_seconds_count{{endpoint="{ep}"}} {r["count"]}')
+    for name, key, help_text, scale in (
+            ('http_request_errors_total', 'errors', 'Antworten mit Status >= 500.', 1),
+            ('http_request_sql_queries_total', 'sql_count', 'SQL-Statements in Requests.', 1),
+            ('http_request_sql_seconds_total', 'sql_ms', 'Zeit in SQL-Statements.', 1000),
+            ('http_request_n_plus_one_total', 'n_plus_one', f'Requests mit >= {N_PLUS_ONE_THRESHOLD} gleichen Statements.', 1)):
+        out.append(f'# HELP {name} {help_text}')
+        out.append(f'# TYPE {name} counter')
+        for r in rows:
+            value = round(r[key] / scale, 6) if isinstance(r[key], float) else r[key]
+            out.append(f'{name}{{endpoint="{_label(r["endpoint"])}"}} {value}')
+    if pool:
+        for key, kind in (('checked_out', 'gauge'), ('checked_in', 'gauge'), ('overflow', 'gauge'), ('size', 'gauge'),
+                          ('checkouts', 'counter'), ('timeouts', 'counter'), ('invalidated', 'counter'),
+                          ('connects', 'counter'), ('slow_checkouts', 'counter')):
+            if key in pool:
+                name = f'db_pool_{key}' + ('_total' if kind == 'counter' else '')
+                out.append(f'# TYPE {name} {kind}')
+                out.append(f'{name} {pool[key]}')
+        out.append('# TYPE db_pool_checkout_wait_max_seconds gauge')
+        out.append(f'db_pool_checkout_wait_max_seconds {pool["wait_max_ms"] / 1000:g}')
+    return '\n'.join(out) + '\n'
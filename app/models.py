@@ -40,6 +40,8 @@ class Event(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Letzte Änderung – Teil des ETags für den Kalender-Feed (Änderungen verändern weder COUNT noch MAX(id))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     color = db.Column(db.String(20))  # Für die Ereignisfarbe
     all_day = db.Column(db.Boolean, default=False)
     reminder = db.Column(db.Boolean, default=False)
@@ -48,6 +50,14 @@ class Event(db.Model):
     is_important = db.Column(db.Boolean, default=False)
     is_recurring = db.Column(db.Boolean, default=False)
     recurrence = db.Column(db.String(50))  # z.B. 'annual'
+    # Zeitfenster-Abfragen des Kalender-Feeds (start_time <= view_end AND end_time >= view_start).
+    # Zwei Richtungen, damit der Planer je nach Lage des Fensters den kleineren Range-Scan wählt
+    # (aktuelle Monate: end_time-Seite; weit zurückliegende Monate: start_time-Seite).
+    __table_args__ = (
+        db.Index('ix_event_start_end', 'start_time', 'end_time'),
+        db.Index('ix_event_end_start', 'end_time', 'start_time'),
+        db.Index('ix_event_recurrence', 'is_recurring', 'recurrence'),
+    )
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -98,6 +108,12 @@ class ChatMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     room_id = db.Column(db.Integer, db.ForeignKey('chat_rooms.id'), index=True, default=1)
     archived_at = db.Column(db.DateTime, index=True)
+    # Keyset-Pagination pro Raum (room_id = ? AND id > / < cursor ORDER BY id)
+    # Volltextsuche (app.search): FULLTEXT nur auf MySQL, SQLite nutzt eine FTS5-Schattentabelle
+    __table_args__ = (
+        db.Index('ix_chat_messages_room_id_id', 'room_id', 'id'),
+        db.Index('ft_chat_messages_content', 'content', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
 
 class ChatRoom(db.Model):
     __tablename__ = 'chat_rooms'
@@ -113,9 +129,35 @@ class Photo(db.Model):
     __tablename__ = 'photos'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
-    filename = db.Column(db.String(255), nullable=False, unique=True)
+    # Inhaltsadressiert (app.storage): mehrere Fotos können dieselbe Datei referenzieren
+    filename = db.Column(db.String(255), nullable=False, index=True)
     title = db.Column(db.String(120))
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Ergebnis der Bildverarbeitung (app.image_jobs): pending -> ready/failed
+    processing_state = db.Column(db.String(10), nullable=False, default='ready', server_default='ready')
+    processed_at = db.Column(db.DateTime)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
+
+class StoredFile(db.Model):
+    """Abgelegte Datei (app.storage) mit Referenzzähler"""
+    __tablename__ = 'stored_files'
+    id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.String(20), nullable=False)  # photos, avatars
+    sha256 = db.Column(db.String(64), nullable=False)
+    ext = db.Column(db.String(5), nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('bucket', 'sha256', name='uq_stored_file_bucket_sha'),)
+
+class StatCounter(db.Model):
+    """Materialisierte Zähler für Admin-Statistiken (app.stat_counters)"""
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
 
 class UserProfile(db.Model):
     __tablename__ = 'user_profiles'
@@ -146,6 +188,14 @@ class NotificationEvent(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     delivered = db.Column(db.Boolean, default=False, index=True)
     delivered_at = db.Column(db.DateTime)
+    # Outbox-Zustellung (E-Mail/Push) durch app.notification_dispatcher
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime)  # Backoff bzw. Reservierung durch einen Dispatcher
+    last_error = db.Column(db.String(255))
+
+    __table_args__ = (
+        db.Index('ix_notification_events_outbox', 'delivered', 'next_attempt_at'),
+    )
 
 class PushSubscription(db.Model):
     __tablename__ = 'push_subscriptions'
@@ -183,6 +233,12 @@ class AuditLog(db.Model):
     details = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    # Filter nach Action + Keyset-Pagination über created_at (id hängt InnoDB implizit an)
+    __table_args__ = (
+        db.Index('ix_audit_log_action_created', 'action', 'created_at'),
+        db.Index('ft_audit_log_details', 'details', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
 # ---- Finanz-Konten ----
 class Account(db.Model):
     __tablename__ = 'accounts'
@@ -249,4 +305,6 @@ class FinancialGoal(db.Model):
 
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # Identitätsdaten aus dem Cache (app.user_cache), ORM-Objekt nur bei Bedarf
+    from app import user_cache
+    return user_cache.load(id)
@@ -0,0 +1,189 @@
+"""Asynchrone Zustellung von E-Mail- und Push-Benachrichtigungen.
+
+notify_user schreibt nur noch NotificationEvent Zeilen (Outbox) und weckt den Dispatcher.
+Der Dispatcher holt fällige, unzugestellte Zeilen, beansprucht sie per bedingtem UPDATE
+(mehrere Instanzen/Prozesse stellen dadurch nie doppelt zu), liefert parallel über einen
+Thread-Pool aus und setzt delivered/delivered_at – oder plant bei Fehlern einen neuen
+Versuch mit exponentiellem Backoff ein.
+
+Betrieb:
+  - im App-Prozess (Default, NOTIFY_DISPATCHER_IN_APP=1): Hintergrund-Task, Start beim ersten Request
+  - separat: NOTIFY_DISPATCHER_IN_APP=0 und `flask notifications-worker`
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message as MailMessage
+from sqlalchemy import or_, update
+from app import db, mail, socketio, notification_prefs, push_sender
+from app.models import NotificationEvent
+
+OUTBOX_CHANNELS = ('email', 'push')
+
+_wake = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+def init_app(app):
+    @app.before_request
+    def _start_dispatcher():
+        if not _started and app.config.get('NOTIFY_DISPATCHER_IN_APP', True):
+            ensure_started(app)
+
+    @app.cli.command('notifications-worker')
+    def notifications_worker():
+        """Stellt ausstehende E-Mail/Push Benachrichtigungen zu (Dauerbetrieb)."""
+        run_forever(app)
+
+def ensure_started(app):
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    socketio.start_background_task(run_forever, app)
+
+def wake():
+    """Dispatcher sofort anstoßen (statt auf das nächste Poll-Intervall zu warten)."""
+    _wake.set()
+
+def run_forever(app):
+    interval = app.config.get('NOTIFY_POLL_INTERVAL', 5)
+    while True:
+        delivered = 0
+        with app.app_context():
+            try:
+                delivered = dispatch_pending()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error('Notification Dispatch fehlgeschlagen: %r', e)
+            finally:
+                db.session.remove()
+        if not delivered:
+            _wake.wait(interval)
+            _wake.clear()
+
+def _backoff(attempts):
+    base = current_app.config.get('NOTIFY_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), 3600))
+
+def _claim(ev, now):
+    """Zeile für diesen Prozess reservieren (Lease bis zum nächsten möglichen Versuch)."""
+    lease = now + timedelta(seconds=current_app.config.get('NOTIFY_CLAIM_SECONDS', 120))
+    res = db.session.execute(
+        update(NotificationEvent)
+        .where(NotificationEvent.id == ev.id, NotificationEvent.delivered.is_(False),
+               or_(NotificationEvent.next_attempt_at.is_(None), NotificationEvent.next_attempt_at <= now))
+        .values(next_attempt_at=lease)
+    )
+    return res.rowcount == 1
+
+def dispatch_pending():
+    """Ein Durchlauf: fällige Outbox-Zeilen zustellen. Rückgabe: Anzahl bearbeiteter Zeilen."""
+    NE = NotificationEvent
+    cfg = current_app.config
+    now = datetime.utcnow()
+    rows = NE.query.filter(
+        NE.delivered.is_(False),
+        NE.channel.in_(OUTBOX_CHANNELS),
+        NE.attempts < cfg.get('NOTIFY_MAX_ATTEMPTS', 5),
+        or_(NE.next_attempt_at.is_(None), NE.next_attempt_at <= now),
+    ).order_by(NE.id.asc()).limit(cfg.get('NOTIFY_BATCH_SIZE', 100)).all()
+    claimed = [ev for ev in rows if _claim(ev, now)]
+    db.session.commit()
+    if not claimed:
+        return 0
+    jobs = _build_jobs(claimed)
+    app = current_app._get_current_object()
+    results = [None] * len(jobs)
+    email_idx = [i for i, job in enumerate(jobs) if job['channel'] == 'email']
+    with ThreadPoolExecutor(max_workers=cfg.get('NOTIFY_DISPATCH_WORKERS', 4)) as pool:
+        # Alle E-Mails des Durchlaufs über eine SMTP-Verbindung, Push parallel daneben
+        email_future = pool.submit(_deliver_emails, app, [jobs[i] for i in email_idx]) if email_idx else None
+        other = {i: pool.submit(_deliver, app, job) for i, job in enumerate(jobs) if job['channel'] != 'email'}
+        for i, fut in other.items():
+            results[i] = fut.result()
+        if email_future:
+            for i, res in zip(email_idx, email_future.result()):
+                results[i] = res
+    done = datetime.utcnow()
+    for ev, (ok, error) in zip(claimed, results):
+        ev.attempts = (ev.attempts or 0) + 1
+        if ok:
+            ev.delivered = True
+            ev.delivered_at = done
+            ev.last_error = None
+        else:
+            ev.last_error = (error or '')[:255]
+            ev.next_attempt_at = done + _backoff(ev.attempts)
+    db.session.commit()
+    return len(claimed)
+
+def _build_jobs(events):
+    """Alle DB-Lesezugriffe im Dispatcher-Thread; die Pool-Threads senden nur noch."""
+    recipients = notification_prefs.load({ev.user_id for ev in events})
+    jobs = []
+    for ev in events:
+        try:
+            payload = json.loads(ev.payload or '{}')
+        except ValueError:
+            payload = {}
+        entry = recipients[ev.user_id]
+        jobs.append({'channel': ev.channel, 'kind': ev.kind, 'payload': payload,
+                     'email': entry['email'], 'subscriptions': entry['push']})
+    return jobs
+
+def _email_message(job):
+    kind, payload = job['kind'], job['payload']
+    subject = payload.get('subject') or f'Neue Benachrichtigung: {kind}'
+    body = payload.get('message') or payload.get('title') or json.dumps(payload)[:400]
+    return MailMessage(subject=subject, recipients=[job['email']], body=body)
+
+def _deliver_emails(app, jobs):
+    """Sendet alle E-Mail-Jobs über eine gemeinsame SMTP-Verbindung. Rückgabe: Liste (ok, fehlertext)."""
+    results = [(True, None) if not job['email'] else None for job in jobs]  # keine Adresse -> nichts zuzustellen
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+    with app.app_context():
+        try:
+            with mail.connect() as conn:
+                for i in pending:
+                    try:
+                        conn.send(_email_message(jobs[i]))
+                        results[i] = (True, None)
+                    except Exception as e:
+                        results[i] = (False, repr(e))
+        except Exception as e:
+            # Verbindungsaufbau/-abbau fehlgeschlagen: nicht gesendete erneut versuchen
+            for i in pending:
+                if results[i] is None:
+                    results[i] = (False, repr(e))
+    return results
+
+def _deliver(app, job):
+    """Einzelzustellung für alle Kanäle außer E-Mail (die laufen gebündelt über _deliver_emails).
+    Rückgabe (ok, fehlertext)."""
+    with app.app_context():
+        try:
+            if job['channel'] == 'push':
+                return _deliver_push(app, job)
+        except Exception as e:
+            return False, repr(e)
+    return True, None
+
+def _deliver_push(app, job):
+    if not (app.config.get('VAPID_PRIVATE_KEY') and app.config.get('VAPID_PUBLIC_KEY')) or not job['subscriptions']:
+        return True, None
+    data = json.dumps({'title': f"Neue {job['kind']}", 'body': job['payload'].get('message') or job['payload'].get('title') or job['kind'], 'url': '/'})
+    res = push_sender.send(job['subscriptions'], data)
+    try:
+        push_sender.prune(res['gone'])
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning('Push-Subscriptions konnten nicht entfernt werden: %r', e)
+    # Mindestens ein Gerät erreicht oder nur abgelaufene Subscriptions -> erledigt; sonst erneut versuchen
+    ok = bool(res['sent']) or not res['errors']
+    return ok, ('; '.join(e[:80] for e in res['errors']) or None)
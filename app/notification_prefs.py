@@ -0,0 +1,79 @@
+"""Prozesslokaler Cache für Benachrichtigungs-Präferenzen, Push-Subscriptions und E-Mail.
+
+Pro Benutzer werden NotificationPreference Zeilen, Push-Subscriptions und E-Mail-Adresse
+einmal geladen (für viele Benutzer gebündelt: je eine IN-Abfrage) und für
+NOTIFY_PREF_CACHE_TTL Sekunden gehalten. Die aufgelösten Kanal-Mengen werden pro
+(kind, angefragte Kanäle) im Eintrag gemerkt.
+
+Änderungen (Profil-Formular, /push/subscribe, entfernte Subscriptions, Admin: E-Mail geändert,
+Konto gelöscht) rufen invalidate(user_id) auf.
+Bei mehreren Instanzen begrenzt die TTL, wie lange andere Prozesse alte Werte sehen.
+"""
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models import NotificationPreference, PushSubscription, User
+
+_cache = {}  # user_id -> (expires_at, entry)
+_lock = threading.Lock()
+
+def _ttl():
+    return current_app.config.get('NOTIFY_PREF_CACHE_TTL', 60)
+
+def load(user_ids):
+    """Einträge für alle user_ids; fehlende/abgelaufene werden gebündelt nachgeladen."""
+    user_ids = {int(u) for u in user_ids}
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        for uid in user_ids:
+            hit = _cache.get(uid)
+            if hit and hit[0] > now:
+                found[uid] = hit[1]
+    missing = user_ids - found.keys()
+    if missing:
+        fresh = {uid: {'prefs': {}, 'push': [], 'email': None, 'resolved': {}} for uid in missing}
+        for p in NotificationPreference.query.filter(NotificationPreference.user_id.in_(missing)).all():
+            fresh[p.user_id]['prefs'].setdefault(p.kind, {})[p.channel] = bool(p.enabled)
+        for s in PushSubscription.query.filter(PushSubscription.user_id.in_(missing)).all():
+            fresh[s.user_id]['push'].append({'id': s.id, 'endpoint': s.endpoint, 'keys': {'p256dh': s.p256dh, 'auth': s.auth}})
+        # Soft-gelöschte Konten bekommen keine E-Mail mehr (Adresse ist anonymisiert)
+        for uid, email in db.session.query(User.id, User.email).filter(User.id.in_(missing), User.deleted_at.is_(None)).all():
+            fresh[uid]['email'] = email
+        expires = now + _ttl()
+        with _lock:
+            for uid, entry in fresh.items():
+                _cache[uid] = (expires, entry)
+        found.update(fresh)
+    return found
+
+def get(user_id):
+    return load([user_id])[int(user_id)]
+
+def resolve_channels(entry, kind, channels):
+    """Regeln aus notify_user:
+      - keine Präferenzen für kind -> nur socket (E-Mail ist Opt-In)
+      - sonst alle aktivierten, angefragten Kanäle
+      - Push-Subscriptions vorhanden und socket angefragt -> push ergänzen
+    """
+    key = (kind, tuple(sorted(channels)))
+    resolved = entry['resolved'].get(key)
+    if resolved is None:
+        prefs = entry['prefs'].get(kind)
+        if not prefs:
+            resolved = {'socket'} & set(channels)
+        else:
+            resolved = {ch for ch, enabled in prefs.items() if enabled and ch in channels}
+        if 'socket' in channels and entry['push']:
+            resolved.add('push')
+        resolved = frozenset(resolved)
+        entry['resolved'][key] = resolved
+    return resolved
+
+def invalidate(user_id=None):
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(user_id), None)
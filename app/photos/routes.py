@@ -1,37 +1,19 @@
-from flask import render_template, request, redirect, url_for, flash, send_from_directory, jsonify, current_app
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-import os, uuid, errno
+import os
 from datetime import datetime
-from app import db
+from app import db, imaging, image_jobs, uploads, storage
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.http_cache import conditional_json
+from sqlalchemy import func
 from . import bp
 from app.models import Photo
 
-ALLOWED_EXT = {'png','jpg','jpeg','gif','webp'}
-
-def _allowed(fn):
-    return '.' in fn and fn.rsplit('.',1)[1].lower() in ALLOWED_EXT
-
-def _ensure_dir(path):
-    try:
-        os.makedirs(path, exist_ok=True)
-        return path
-    except PermissionError:
-        fallback = '/tmp/family_portal_fallback/photos'
-        try:
-            os.makedirs(fallback, exist_ok=True)
-            return fallback
-        except Exception:
-            raise
-    except OSError as e:
-        if e.errno != errno.EEXIST:
-            raise
-    return path
+THUMB_MAX_AGE = 365 * 24 * 3600
 
 def _upload_dir():
-    base = current_app.config.get('UPLOAD_BASE') or '/tmp'
-    target = os.path.join(base, 'photos')
-    return _ensure_dir(target)
+    return storage.bucket_root('photos')
 
 @bp.route('/')
 @login_required
@@ -40,36 +22,75 @@ def index():
     return render_template('photos/index.html', photos=photos)
 
 @bp.route('/upload', methods=['POST'])
+@uploads.image_upload(_upload_dir, 'PHOTO_MAX_BYTES')
 @login_required
 def upload():
-    f = request.files.get('file')
     title = (request.form.get('title') or '').strip()[:120]
-    if not f or f.filename == '':
+    spool = uploads.received_image('file')
+    if spool is None:
         flash('Keine Datei','error')
         return redirect(url_for('photos.index'))
-    if not _allowed(f.filename):
-        flash('Dateityp nicht erlaubt','error')
-        return redirect(url_for('photos.index'))
-    ext = f.filename.rsplit('.',1)[1].lower()
-    fname = f"{uuid.uuid4().hex}.{ext}"
-    path = os.path.join(_upload_dir(), secure_filename(fname))
-    f.save(path)
-    p = Photo(user_id=current_user.id, filename=fname, title=title, created_at=datetime.utcnow())
+    # Dateiname aus Inhalt (SHA-256) und erkanntem Typ; identische Uploads teilen sich eine Datei
+    fname, _ = storage.store('photos', spool)
+    p = Photo(user_id=current_user.id, filename=fname, title=title, created_at=datetime.utcnow(), processing_state='pending')
+    done = Photo.query.filter_by(filename=fname, processing_state='ready').first()
+    if done is not None:
+        # Schon verarbeitet -> Ergebnis übernehmen statt erneut zu rechnen
+        p.width, p.height, p.bytes = done.width, done.height, done.bytes
+        p.processing_state, p.processed_at = 'ready', datetime.utcnow()
     db.session.add(p)
     db.session.commit()
+    if p.processing_state == 'pending':
+        # Vorschaubilder/Metadaten im Hintergrund; Galerie zeigt bis dahin einen Platzhalter
+        image_jobs.submit_photo(current_app._get_current_object(), p.id, storage.dir_for('photos', fname), fname)
     flash('Hochgeladen','ok')
     return redirect(url_for('photos.index'))
 
+@bp.errorhandler(uploads.UploadRejected)
+@bp.errorhandler(RequestEntityTooLarge)
+def upload_rejected(e):
+    flash(e.description if isinstance(e, uploads.UploadRejected) else 'Upload zu groß', 'error')
+    return redirect(url_for('photos.index'))
+
 @bp.route('/raw/<fname>')
 @login_required
 def raw(fname):
-    return send_from_directory(_upload_dir(), fname, as_attachment=False)
+    return storage.send(storage.dir_for('photos', fname), fname)
+
+@bp.route('/thumb/<int:size>/<fname>')
+@login_required
+def thumb(size, fname):
+    """Verkleinerte Variante (WebP/JPEG). Format per ?fmt= oder Accept-Header. Fehlende Derivate
+    (Fotos von vor der Umstellung) werden im Hintergrund erzeugt, bis dahin gibt es das Original."""
+    if size not in imaging.SIZES:
+        abort(404)
+    fname = secure_filename(fname)
+    fmt = request.args.get('fmt')
+    if fmt not in imaging.FORMATS:
+        fmt = 'webp' if request.accept_mimetypes.best_match(['image/webp', 'image/jpeg']) == 'image/webp' else 'jpeg'
+    directory = storage.dir_for('photos', fname)
+    name = imaging.derivative_name(fname, size, fmt)
+    if not os.path.isfile(os.path.join(directory, name)):
+        if not os.path.isfile(os.path.join(directory, fname)):
+            abort(404)
+        # Nie im Request dekodieren: höchstens ein Job je Foto, 'failed' wird nicht wiederholt
+        image_jobs.ensure_derivatives(current_app._get_current_object(), fname)
+        if not os.path.isfile(os.path.join(directory, name)):  # IMAGE_WORKERS=0: schon fertig
+            return redirect(url_for('photos.raw', fname=fname))
+    resp = storage.send(directory, name, mimetype=imaging.MIMETYPES[fmt], max_age=THUMB_MAX_AGE)
+    # Dateinamen sind eindeutig und ändern sich nie -> langfristig, aber nur privat cachen
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.cache_control.immutable = True
+    if 'fmt' not in request.args:
+        resp.vary.add('Accept')
+    return resp
 
 @bp.route('/download/<fname>')
 @login_required
 def download(fname):
     """Ermöglicht direkten Download (Content-Disposition Attachment)."""
-    return send_from_directory(_upload_dir(), fname, as_attachment=True)
+    return storage.send(storage.dir_for('photos', fname), fname, as_attachment=True)
 
 @bp.route('/api/delete/<int:photo_id>', methods=['DELETE','POST'])
 @login_required
@@ -77,20 +98,21 @@ def delete_photo(photo_id):
     p = Photo.query.get_or_404(photo_id)
     if p.user_id != current_user.id and not current_user.is_admin:
         return jsonify({'error':'Unauthorized'}),403
-    # Datei entfernen (Best Effort)
-    try:
-        path = os.path.join(_upload_dir(), p.filename)
-        if os.path.isfile(path):
-            os.remove(path)
-    except Exception:
-        pass
-    from app import db
+    # Datei wird erst entfernt, wenn kein anderes Foto sie mehr referenziert (nach dem Commit)
+    storage.release('photos', p.filename)
     db.session.delete(p)
     db.session.commit()
     return jsonify({'status':'deleted','id':photo_id})
 
+def _photos_version():
+    # processed_at ändert sich beim Abschluss der Bildverarbeitung -> neues ETag für wartende Galerien
+    return tuple(db.session.query(func.count(Photo.id), func.max(Photo.id), func.max(Photo.processed_at))
+                 .filter(Photo.user_id==current_user.id).one())
+
 @bp.route('/api/list')
 @login_required
+@conditional_json(_photos_version)
 def api_list():
     photos = Photo.query.filter_by(user_id=current_user.id).order_by(Photo.created_at.desc()).all()
-    return jsonify([{'id':p.id,'title':p.title,'filename':p.filename,'created_at':p.created_at.isoformat()} for p in photos])
+    return jsonify([{'id':p.id,'title':p.title,'filename':p.filename,'created_at':p.created_at.isoformat(),
+                     'state':p.processing_state,'width':p.width,'height':p.height,'bytes':p.bytes} for p in photos])
@@ -1,34 +1,17 @@
-from flask import render_template, request, redirect, url_for, flash, send_from_directory, current_app
+from flask import render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-import os, uuid, errno
+import os
 from datetime import datetime
-from app import db
+from app import db, notification_prefs, imaging, image_jobs, uploads, storage
+from werkzeug.exceptions import RequestEntityTooLarge
 from . import bp
 from app.models import UserProfile, get_or_create_profile, NotificationPreference
 
-ALLOWED_AVATAR = {'png','jpg','jpeg','gif','webp'}
-
-def _ensure_dir(path):
-    try:
-        os.makedirs(path, exist_ok=True)
-        return path
-    except PermissionError:
-        fallback = '/tmp/family_portal_fallback/avatars'
-        try:
-            os.makedirs(fallback, exist_ok=True)
-            return fallback
-        except Exception:
-            raise
-    except OSError as e:
-        if e.errno != errno.EEXIST:
-            raise
-    return path
+AVATAR_SIZES = (256,)
 
 def _avatar_dir():
-    base = current_app.config.get('UPLOAD_BASE') or '/tmp'
-    target = os.path.join(base, 'avatars')
-    return _ensure_dir(target)
+    return storage.bucket_root('avatars')
 
 @bp.route('/', methods=['GET','POST'])
 @login_required
@@ -37,7 +20,7 @@ def index():
     if request.method == 'POST':
         bio = (request.form.get('bio') or '').strip()
         profile.bio = bio
-    kinds = ['events','chat','photos','system']  # finance entfernt
+        kinds = ['events','chat','photos','system']  # finance entfernt
         channels = ['email','socket']
         # Bestehende Prefs laden in Dict
         existing = {(p.kind, p.channel): p for p in NotificationPreference.query.filter_by(user_id=current_user.id).all()}
@@ -51,6 +34,7 @@ def index():
                 else:
                     db.session.add(NotificationPreference(user_id=current_user.id, channel=ch, kind=kind, enabled=enabled))
         db.session.commit()
+        notification_prefs.invalidate(current_user.id)
         flash('Gespeichert','ok')
         return redirect(url_for('profile.index'))
     # Prefs für Anzeige
@@ -58,27 +42,43 @@ def index():
     return render_template('profile/index.html', profile=profile, prefs=prefs)
 
 @bp.route('/avatar', methods=['POST'])
+@uploads.image_upload(_avatar_dir, 'AVATAR_MAX_BYTES')
 @login_required
 def avatar():
     profile = get_or_create_profile(current_user)
-    f = request.files.get('avatar')
-    if not f or f.filename=='':
+    spool = uploads.received_image('avatar')
+    if spool is None:
         flash('Keine Datei','error')
         return redirect(url_for('profile.index'))
-    ext = f.filename.rsplit('.',1)[-1].lower()
-    if ext not in ALLOWED_AVATAR:
-        flash('Typ nicht erlaubt','error')
-        return redirect(url_for('profile.index'))
-    fname = f"{uuid.uuid4().hex}.{ext}"
-    path = os.path.join(_avatar_dir(), secure_filename(fname))
-    f.save(path)
+    fname, new = storage.store('avatars', spool)
+    # Bisherigen Avatar freigeben (Datei verschwindet, wenn niemand sonst ihn nutzt)
+    storage.release('avatars', profile.avatar_filename)
     profile.avatar_filename = fname
     profile.updated_at = datetime.utcnow()
     db.session.commit()
+    if new:
+        # 256px-Variante und Entfernen der Metadaten im Hintergrund
+        image_jobs.submit_avatar(current_app._get_current_object(), storage.dir_for('avatars', fname), fname, AVATAR_SIZES)
     flash('Avatar aktualisiert','ok')
     return redirect(url_for('profile.index'))
 
+@bp.errorhandler(uploads.UploadRejected)
+@bp.errorhandler(RequestEntityTooLarge)
+def upload_rejected(e):
+    flash(e.description if isinstance(e, uploads.UploadRejected) else 'Upload zu groß', 'error')
+    return redirect(url_for('profile.index'))
+
 @bp.route('/avatar/raw/<fname>')
 @login_required
 def avatar_raw(fname):
-    return send_from_directory(_avatar_dir(), fname, as_attachment=False)
+    """Avatar; mit ?size=256 die verkleinerte Variante, solange sie (noch) fehlt das Original."""
+    directory = storage.dir_for('avatars', fname)
+    size = request.args.get('size', type=int)
+    if size in AVATAR_SIZES:
+        fmt = 'webp' if request.accept_mimetypes.best_match(['image/webp', 'image/jpeg']) == 'image/webp' else 'jpeg'
+        name = imaging.derivative_name(secure_filename(fname), size, fmt)
+        if os.path.isfile(os.path.join(directory, name)):
+            resp = storage.send(directory, name, mimetype=imaging.MIMETYPES[fmt])
+            resp.vary.add('Accept')
+            return resp
+    return storage.send(directory, fname)
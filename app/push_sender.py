@@ -0,0 +1,129 @@
+"""Web Push Versand mit wiederverwendeten Verbindungen.
+
+- Eine requests.Session pro Push-Dienst (Origin des Endpoints, z.B. fcm.googleapis.com):
+  TLS-Verbindungen bleiben per Keep-Alive offen und werden von allen Sends geteilt.
+- VAPID: Schlüssel wird einmal geparst, der signierte JWT pro Audience gecacht bis kurz
+  vor Ablauf (statt pro Nachricht neu mit ECDSA zu signieren).
+- Die Subscriptions eines Aufrufs werden parallel beliefert (PUSH_MAX_WORKERS).
+- Antwortet der Dienst mit 404/410, ist die Subscription abgelaufen; prune() löscht sie,
+  damit spätere Sends sie überspringen.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from pywebpush import WebPusher
+from py_vapid import Vapid
+from app import db, notification_prefs
+from app.models import PushSubscription
+
+GONE_STATUS = (404, 410)
+VAPID_LIFETIME = 12 * 3600  # Maximum laut RFC 8292: 24h
+VAPID_RENEW_BEFORE = 600
+
+_lock = threading.Lock()
+_sign_lock = threading.Lock()
+_sessions = {}  # origin -> requests.Session
+_vapid_keys = {}  # private key (String/Pfad) -> Vapid
+_vapid_headers = {}  # (private key, sub, audience) -> (exp, headers)
+_executor = None
+
+def _origin(endpoint):
+    url = urlparse(endpoint)
+    return f'{url.scheme}://{url.netloc}'
+
+def _session(origin):
+    with _lock:
+        session = _sessions.get(origin)
+        if session is None:
+            size = current_app.config.get('PUSH_POOL_SIZE', 10)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[origin] = session
+        return session
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config.get('PUSH_MAX_WORKERS', 8), thread_name_prefix='webpush')
+        return _executor
+
+def vapid_headers(audience):
+    """Authorization Header für eine Audience (Origin des Push-Dienstes), gecacht bis kurz vor Ablauf."""
+    cfg = current_app.config
+    private_key = cfg.get('VAPID_PRIVATE_KEY')
+    sub = f"mailto:{cfg.get('VAPID_CLAIM_EMAIL')}"
+    key = (private_key, sub, audience)
+    now = int(time.time())
+    hit = _vapid_headers.get(key)
+    if hit and hit[0] - VAPID_RENEW_BEFORE > now:
+        return hit[1]
+    with _sign_lock:
+        # Parallele Sends an denselben Dienst sollen nur einmal signieren
+        hit = _vapid_headers.get(key)
+        if hit and hit[0] - VAPID_RENEW_BEFORE > now:
+            return hit[1]
+        vapid = _vapid_keys.get(private_key)
+        if vapid is None:
+            vapid = Vapid.from_file(private_key) if os.path.isfile(private_key) else Vapid.from_string(private_key=private_key)
+            _vapid_keys[private_key] = vapid
+        exp = now + VAPID_LIFETIME
+        headers = vapid.sign({'sub': sub, 'aud': audience, 'exp': exp})
+        _vapid_headers[key] = (exp, headers)
+    return headers
+
+def _send_one(app, sub, data):
+    """Rückgabe (status, fehlertext); status None bei Netzwerkfehlern."""
+    with app.app_context():
+        origin = _origin(sub['endpoint'])
+        try:
+            response = WebPusher(sub, requests_session=_session(origin)).send(
+                data, dict(vapid_headers(origin)), timeout=app.config.get('PUSH_TIMEOUT', 10))
+        except Exception as e:
+            return None, repr(e)
+        if response.status_code > 202:
+            return response.status_code, f'{response.status_code} {response.reason}'
+        return response.status_code, None
+
+def send(subscriptions, data):
+    """Sendet `data` (JSON-String) parallel an alle Subscriptions.
+    subscriptions: Dicts mit id, endpoint, keys (wie aus notification_prefs).
+    Rückgabe: {'sent': [ids], 'gone': [ids], 'errors': [texte]}. Benötigt App-Context.
+    """
+    result = {'sent': [], 'gone': [], 'errors': []}
+    if not subscriptions:
+        return result
+    cfg = current_app.config
+    if not (cfg.get('VAPID_PRIVATE_KEY') and cfg.get('VAPID_PUBLIC_KEY')):
+        result['errors'].append('VAPID keys missing')
+        return result
+    app = current_app._get_current_object()
+    futures = [(sub, _pool().submit(_send_one, app, sub, data)) for sub in subscriptions]
+    for sub, fut in futures:
+        status, error = fut.result()
+        if status in GONE_STATUS:
+            result['gone'].append(sub.get('id'))
+        elif error:
+            result['errors'].append(error)
+        else:
+            result['sent'].append(sub.get('id'))
+    return result
+
+def prune(subscription_ids):
+    """Abgelaufene Subscriptions löschen (404/410) und den Präferenz-Cache der Besitzer leeren."""
+    ids = [i for i in subscription_ids if i is not None]
+    if not ids:
+        return 0
+    owners = {uid for (uid,) in db.session.query(PushSubscription.user_id).filter(PushSubscription.id.in_(ids)).all()}
+    deleted = PushSubscription.query.filter(PushSubscription.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    for uid in owners:
+        notification_prefs.invalidate(uid)
+    return deleted
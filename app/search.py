@@ -0,0 +1,127 @@
+"""Volltextsuche über AuditLog.details und ChatMessage.content.
+
+MySQL: FULLTEXT-Indizes (siehe models, ft_*), Abfrage per MATCH ... AGAINST im Boolean Mode,
+Relevanz ist der MATCH-Wert. SQLite (Entwicklung/Tests): FTS5-Schattentabellen <tabelle>_fts mit
+externem Inhalt, per Trigger synchron gehalten (auch bei Core-Bulk-Statements wie "Raum leeren"),
+Relevanz aus bm25(). Andere Datenbanken: ilike.
+
+Die Eingabe wird in Wörter zerlegt (Operatoren der Suchsyntax fallen weg). Alle Wörter müssen
+vorkommen, das letzte auch als Präfix (Suche während der Eingabe). Wörter unter MIN_TOKEN_LENGTH
+Zeichen kennt der MySQL-Index nicht (innodb_ft_min_token_size) und werden verworfen; bleibt kein
+Wort übrig, wird per ilike gesucht – bei LIMIT/Keyset nur bis die Seite voll ist.
+"""
+import re
+import click
+from sqlalchemy import event, func, inspect, literal, literal_column, select, table, text
+from app import db
+from app.models import AuditLog, ChatMessage
+
+MIN_TOKEN_LENGTH = 3
+
+# Modell -> durchsuchte Spalte
+SOURCES = {AuditLog: 'details', ChatMessage: 'content'}
+
+def init_app(app):
+    @app.cli.command('search-rebuild')
+    def search_rebuild():
+        """Suchindizes anlegen (falls nötig) und neu aufbauen."""
+        with db.engine.begin() as connection:
+            for model, column in SOURCES.items():
+                ensure_schema(connection, model, column)
+                if connection.dialect.name == 'sqlite':
+                    fts = fts_table(model)
+                    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                click.echo(f'{model.__tablename__}.{column}: ok')
+
+def fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+def fulltext_index(model, column):
+    return f'ft_{model.__tablename__}_{column}'
+
+def sqlite_ddl(tablename, column):
+    """FTS5-Tabelle mit externem Inhalt und Trigger für Insert/Delete/Update."""
+    fts = f'{tablename}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{tablename}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tablename} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+def ensure_schema(connection, model, column):
+    """Suchindex für model.column anlegen, falls er fehlt (idempotent)."""
+    if connection.dialect.name == 'sqlite':
+        for statement in sqlite_ddl(model.__tablename__, column):
+            connection.execute(text(statement))
+    elif connection.dialect.name == 'mysql':
+        name = fulltext_index(model, column)
+        if name not in {ix['name'] for ix in inspect(connection).get_indexes(model.__tablename__)}:
+            connection.execute(text(f'CREATE FULLTEXT INDEX {name} ON {model.__tablename__} ({column})'))
+
+def _after_create(target, connection, **kw):
+    # db.create_all() (Tests): FULLTEXT kommt aus den Modellen, FTS5 von hier
+    if connection.dialect.name == 'sqlite':
+        for model, column in SOURCES.items():
+            if model.__table__ is target:
+                ensure_schema(connection, model, column)
+
+for _model in SOURCES:
+    event.listen(_model.__table__, 'after_create', _after_create)
+
+def terms(query):
+    return [t for t in re.findall(r'\w+', (query or '').lower()) if len(t) >= MIN_TOKEN_LENGTH]
+
+def _mysql_query(words):
+    return ' '.join(f'+{w}' for w in words) + '*'
+
+def _fts5_query(words):
+    return ' '.join(f'"{w}"' for w in words) + '*'
+
+def _dialect():
+    return db.engine.dialect.name
+
+def _fts_match(model, words):
+    """SQLite: (rowid, score) der Treffer aus der FTS5-Tabelle, score höher = besser."""
+    fts = fts_table(model)
+    return (select(literal_column('rowid').label('id'), (-func.bm25(literal_column(fts))).label('score'))
+            .select_from(table(fts))
+            .where(literal_column(fts).op('MATCH')(_fts5_query(words))))
+
+def condition(model, query):
+    """WHERE-Bedingung "enthält alle Wörter" ohne Ranking (z.B. für chronologische Listen)."""
+    column = getattr(model, SOURCES[model])
+    words = terms(query)
+    if not words:
+        return column.ilike(f'%{query}%')
+    dialect = _dialect()
+    if dialect == 'mysql':
+        return column.match(_mysql_query(words))
+    if dialect == 'sqlite':
+        return model.id.in_(select(_fts_match(model, words).subquery().c.id))
+    return column.ilike(f'%{query}%')
+
+def ranked(stmt, model, query):
+    """stmt auf Treffer einschränken und nach Relevanz sortieren.
+
+    Die Relevanz kommt als zusätzliche Spalte `score` dazu (höher = relevanter).
+    """
+    column = getattr(model, SOURCES[model])
+    words = terms(query)
+    dialect = _dialect() if words else None
+    if dialect == 'mysql':
+        score = column.match(_mysql_query(words))
+        stmt = stmt.filter(score)
+    elif dialect == 'sqlite':
+        hits = _fts_match(model, words).subquery()
+        stmt = stmt.join(hits, hits.c.id == model.id)
+        score = hits.c.score
+    else:
+        stmt = stmt.filter(column.ilike(f'%{query}%'))
+        score = literal(0.0)
+    score = score.label('score')
+    return stmt.add_columns(score).order_by(score.desc(), model.id.desc())
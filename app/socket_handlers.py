@@ -1,14 +1,16 @@
 from flask_login import current_user
 from flask import request, current_app
 from app import socketio
-from flask_socketio import join_room
-from app.models import NotificationPreference, NotificationEvent, PushSubscription
-from app import db, mail
+from flask_socketio import join_room, leave_room, rooms
+from app.models import NotificationEvent
+from app import db, notification_dispatcher, notification_prefs
 from datetime import datetime
-from flask_mail import Message as MailMessage
+from sqlalchemy import insert
 
 # Namespace optional: default
 
+CHAT_MAX_LENGTH = 4000
+
 @socketio.on('connect')
 def handle_connect():
     if current_user.is_authenticated:
@@ -24,6 +26,47 @@ def handle_disconnect():
     # Räume werden automatisch verlassen
     pass
 
+def _chat_room_for(room_id):
+    """ChatRoom laden, falls vorhanden und für den aktuellen Benutzer sichtbar."""
+    from app.models import ChatRoom
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return None
+    room = db.session.get(ChatRoom, room_id)
+    if not room or (room.is_admin_only and not current_user.is_admin):
+        return None
+    return room
+
+@socketio.on('chat_join')
+def handle_chat_join(data):
+    if not current_user.is_authenticated:
+        return
+    room = _chat_room_for((data or {}).get('room_id'))
+    if not room:
+        return
+    from app.chat.buffer import room_name
+    # Pro Verbindung nur ein aktiver Chat-Raum
+    for r in rooms():
+        if r.startswith('chat_') and r != room_name(room.id):
+            leave_room(r)
+    join_room(room_name(room.id))
+
+@socketio.on('chat_send')
+def handle_chat_send(data):
+    if not current_user.is_authenticated:
+        return
+    data = data or {}
+    content = (data.get('content') or '').strip()[:CHAT_MAX_LENGTH]
+    if not content:
+        return
+    room = _chat_room_for(data.get('room_id'))
+    if not room:
+        return
+    from app.chat import buffer
+    # Persistenz + Broadcast an den Raum erfolgen gebündelt im Write-Behind Puffer
+    buffer.enqueue(current_app._get_current_object(), current_user.id, current_user.username, room.id, content)
+
 
 def notify_user(user_id:int, kind:str, payload:dict, channels=None):
     """Versendet eine Benachrichtigung.
@@ -31,6 +74,9 @@ def notify_user(user_id:int, kind:str, payload:dict, channels=None):
       - Wenn keine Präferenzen existieren -> socket als Default aktiv, E-Mail nur Opt-In.
       - Explizit deaktivierte Präferenz blockt Kanal.
       - Wenn Push Subscriptions existieren und 'socket' angefordert wurde, wird 'push' ergänzt.
+    Präferenzen/Subscriptions kommen aus app.notification_prefs (Cache mit TTL).
+    Socket wird sofort emittiert; E-Mail und Push landen als NotificationEvent in der Outbox
+    und werden vom Dispatcher (app.notification_dispatcher) asynchron zugestellt.
     Rückgabe: dict mit Status pro Kanal.
     """
     import json
@@ -38,56 +84,65 @@ def notify_user(user_id:int, kind:str, payload:dict, channels=None):
         channels = ['email','socket']
     result = {}
     try:
-        all_prefs = NotificationPreference.query.filter_by(user_id=user_id, kind=kind).all()
-        if not all_prefs:
-            enabled_channels = {'socket'} & set(channels)
-        else:
-            enabled_channels = {p.channel for p in all_prefs if p.enabled and p.channel in channels}
-        if 'socket' in channels and PushSubscription.query.filter_by(user_id=user_id).count() > 0:
-            enabled_channels.add('push')
+        enabled_channels = notification_prefs.resolve_channels(notification_prefs.get(user_id), kind, channels)
         if not enabled_channels:
             return {'skipped':'no-enabled-channels'}
         now = datetime.utcnow()
         for ch in enabled_channels:
-            ev = NotificationEvent(user_id=user_id, kind=kind, channel=ch, payload=json.dumps(payload), created_at=now)
+            ev = NotificationEvent(user_id=user_id, kind=kind, channel=ch, payload=json.dumps(payload), created_at=now, attempts=0)
             db.session.add(ev)
             if ch == 'socket':
                 socketio.emit('notification', { 'kind': kind, 'payload': payload }, room=f'user_{user_id}')
                 ev.delivered = True; ev.delivered_at = datetime.utcnow()
                 result['socket']='sent'
-            elif ch == 'push':
-                from pywebpush import webpush, WebPushException
-                subs = PushSubscription.query.filter_by(user_id=user_id).all()
-                data = json.dumps({'title': f'Neue {kind}', 'body': payload.get('message') or payload.get('title') or kind, 'url':'/'})
-                priv = current_app.config.get('VAPID_PRIVATE_KEY')
-                pub = current_app.config.get('VAPID_PUBLIC_KEY')
-                claim = current_app.config.get('VAPID_CLAIM_EMAIL')
-                sent=0; errors=0
-                if priv and pub:
-                    for s in subs:
-                        try:
-                            webpush(subscription_info={'endpoint': s.endpoint,'keys':{'p256dh':s.p256dh,'auth':s.auth}}, data=data, vapid_private_key=priv, vapid_claims={'sub':f'mailto:{claim}'})
-                            sent+=1
-                        except WebPushException:
-                            errors+=1
-                result['push']=f'sent:{sent}/err:{errors}'
-            elif ch == 'email':
-                # Einfache Mail (fail-silent in Result vermerken)
-                try:
-                    subject = payload.get('subject') or f'Neue Benachrichtigung: {kind}'
-                    body = payload.get('message') or payload.get('title') or json.dumps(payload)[:400]
-                    from app.models import User
-                    user = User.query.get(user_id)
-                    if user and user.email:
-                        msg = MailMessage(subject=subject, recipients=[user.email], body=body)
-                        mail.send(msg)
-                        ev.delivered = True; ev.delivered_at = datetime.utcnow()
-                        result['email']='sent'
-                    else:
-                        result['email']='no-address'
-                except Exception as e:
-                    result['email']=f'error:{e.__class__.__name__}'
+            elif ch in notification_dispatcher.OUTBOX_CHANNELS:
+                result[ch]='queued'
+        db.session.commit()
+        if 'email' in result or 'push' in result:
+            notification_dispatcher.wake()
+    except Exception as outer:
+        db.session.rollback()
+        result['error']=repr(outer)
+    return result
+
+def notify_users(user_ids, kind:str, payload:dict, channels=None):
+    """Gebündelte Variante von notify_user für viele Empfänger (Familie, Chat-Raum).
+    Präferenzen aller Empfänger in einer Abfrage pro Tabelle (bzw. aus dem Cache), alle
+    NotificationEvent Zeilen in einem Bulk-Insert und einem Commit, ein Socket-Emit an alle
+    Benutzer-Räume. E-Mail/Push stellt der Dispatcher zu (eine SMTP-Verbindung pro Batch).
+    Rückgabe: dict Kanal -> Anzahl Empfänger.
+    """
+    import json
+    if channels is None:
+        channels = ['email','socket']
+    user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+    result = {}
+    if not user_ids:
+        return result
+    try:
+        recipients = notification_prefs.load(user_ids)
+        now = datetime.utcnow()
+        data = json.dumps(payload)
+        rows = []
+        socket_rooms = []
+        for uid in user_ids:
+            for ch in notification_prefs.resolve_channels(recipients[uid], kind, channels):
+                row = {'user_id': uid, 'kind': kind, 'channel': ch, 'payload': data, 'created_at': now, 'attempts': 0, 'delivered': False, 'delivered_at': None}
+                if ch == 'socket':
+                    socket_rooms.append(f'user_{uid}')
+                    row.update(delivered=True, delivered_at=now)
+                elif ch not in notification_dispatcher.OUTBOX_CHANNELS:
+                    continue
+                rows.append(row)
+                result[ch] = result.get(ch, 0) + 1
+        if not rows:
+            return {'skipped':'no-enabled-channels'}
+        db.session.execute(insert(NotificationEvent.__table__), rows)
         db.session.commit()
+        if socket_rooms:
+            socketio.emit('notification', { 'kind': kind, 'payload': payload }, to=socket_rooms)
+        if 'email' in result or 'push' in result:
+            notification_dispatcher.wake()
     except Exception as outer:
         db.session.rollback()
         result['error']=repr(outer)
@@ -0,0 +1,67 @@
+"""Socket.IO Message-Queue Anbindung für mehrere Worker/Instanzen.
+
+Produktiv wird SOCKETIO_MESSAGE_QUEUE auf eine Redis- oder Kombu-URL gesetzt
+(redis://..., amqp://...); Flask-SocketIO wählt den passenden Manager selbst.
+Für lokale Prüfungen gibt es 'local://' – ein In-Process Stand-in, über den mehrere
+Socket.IO Server im selben Prozess Emits austauschen (siehe scripts/check_socketio_fanout.py).
+"""
+import queue
+import threading
+import socketio as python_socketio
+
+_channels = {}  # Kanalname -> Liste der Empfangs-Queues aller lokalen "Worker"
+_channels_lock = threading.Lock()
+
+class LocalQueueManager(python_socketio.PubSubManager):
+    """PubSubManager, der Nachrichten nur innerhalb des Prozesses verteilt."""
+    name = 'local'
+
+    def __init__(self, url='local://', channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with _channels_lock:
+                _channels.setdefault(channel, []).append(self._inbox)
+
+    def _publish(self, data):
+        with _channels_lock:
+            inboxes = list(_channels.get(self.channel, ()))
+        payload = self.json.dumps(data)
+        for inbox in inboxes:
+            inbox.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+def detect_async_mode(configured=None):
+    """async_mode passend zur Worker-Klasse: eventlet/gevent wenn deren Monkey-Patching aktiv ist
+    (gunicorn -k eventlet/gevent patcht vor dem Laden der App), sonst threading."""
+    if configured:
+        return configured
+    try:
+        import eventlet.patcher
+        if eventlet.patcher.is_monkey_patched('socket'):
+            return 'eventlet'
+    except ImportError:
+        pass
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            return 'gevent'
+    except ImportError:
+        pass
+    return 'threading'
+
+def socketio_options(config):
+    """Optionen für socketio.init_app() aus der App-Konfiguration."""
+    options = {
+        'async_mode': detect_async_mode(config.get('SOCKETIO_ASYNC_MODE')),
+        'channel': config.get('SOCKETIO_CHANNEL') or 'family-portal',
+    }
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    if url and url.startswith('local://'):
+        options['client_manager'] = LocalQueueManager(url, channel=options.pop('channel'))
+    elif url:
+        options['message_queue'] = url
+    return options
@@ -0,0 +1,153 @@
+"""Materialisierte Zähler für Admin-Statistiken (Tabelle stat_counters).
+
+Statt bei jedem Seitenaufruf und jedem /admin/api/dashboard Poll COUNT(*) über User, Event,
+Message, Photo, Expense, AuditLog und RecurringTransaction zu zählen (InnoDB: Index-Scan über
+die ganze Tabelle), pflegen Mapper-Events (after_insert/after_delete, für bedingte Zähler auch
+after_update) pro Flush gesammelte Deltas; after_flush schreibt sie mit einem UPDATE pro Zähler
+in derselben Transaktion (Rollback nimmt sie mit zurück). Eine Zeile pro Zähler, damit
+gleichzeitige Inserts verschiedener Tabellen nicht auf dieselbe Zeilensperre warten.
+
+Core-Bulk-Statements und Änderungen außerhalb der App laufen an den Events vorbei: reconcile()
+zählt neu und überschreibt. Es läuft als Hintergrund-Task, sobald read() Zähler älter als
+STATS_RECONCILE_SECONDS findet, und per `flask stats-reconcile` (z.B. Cron).
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import event, func, select, update, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db, socketio
+from app.models import StatCounter, User, Event, Message, Photo, Expense, AuditLog, RecurringTransaction
+
+# name -> (Model, None | (Attribut, Bedingung auf den Wert, dieselbe Bedingung als SQL))
+COUNTERS = {
+    'users_total': (User, None),
+    'users_soft_deleted': (User, ('deleted_at', lambda v: v is not None, lambda c: c.is_not(None))),
+    'events_total': (Event, None),
+    'messages_total': (Message, None),
+    'photos_total': (Photo, None),
+    'expenses_total': (Expense, None),
+    'audit_total': (AuditLog, None),
+    'recurring_active': (RecurringTransaction, ('active', lambda v: v is True, lambda c: c.is_(True))),
+}
+DELTAS_KEY = 'stat_counter_deltas'
+
+_table = StatCounter.__table__
+_reconciling = False
+_reconcile_lock = threading.Lock()
+
+def init_app(app):
+    @app.cli.command('stats-reconcile')
+    def stats_reconcile():
+        """Admin-Zähler neu berechnen (gleicht Bulk-Änderungen und Drift aus)."""
+        for name, value in reconcile().items():
+            click.echo(f'{name}: {value}')
+
+def _matches(target, condition):
+    if condition is None:
+        return True
+    attr, test, _ = condition
+    return test(getattr(target, attr))
+
+def _add(connection, name, delta):
+    connection.info.setdefault(DELTAS_KEY, Counter())[name] += delta
+
+def _on_insert(mapper, connection, target):
+    for name, (model, condition) in COUNTERS.items():
+        if isinstance(target, model) and _matches(target, condition):
+            _add(connection, name, 1)
+
+def _on_delete(mapper, connection, target):
+    for name, (model, condition) in COUNTERS.items():
+        if isinstance(target, model) and _matches(target, condition):
+            _add(connection, name, -1)
+
+def _on_update(mapper, connection, target):
+    # Nur bedingte Zähler ändern sich bei einem UPDATE (z.B. Soft Delete, Dauerauftrag pausiert)
+    for name, (model, condition) in COUNTERS.items():
+        if condition is None or not isinstance(target, model):
+            continue
+        attr, test, _ = condition
+        hist = get_history(target, attr)
+        if not hist.has_changes():
+            continue
+        was = test(hist.deleted[0]) if hist.deleted else None
+        now = test(getattr(target, attr))
+        if was is not None and was != now:
+            _add(connection, name, 1 if now else -1)
+
+def _noop_set(target, value, oldvalue, initiator):
+    pass
+
+for _model in {m for m, _ in COUNTERS.values()}:
+    event.listen(_model, 'after_insert', _on_insert)
+    event.listen(_model, 'after_delete', _on_delete)
+    event.listen(_model, 'after_update', _on_update)
+for _model, _condition in COUNTERS.values():
+    if _condition is not None:
+        # active_history: alten Wert beim Setzen laden, auch wenn das Objekt nach einem Commit abgelaufen ist
+        event.listen(getattr(_model, _condition[0]), 'set', _noop_set, active_history=True)
+
+@event.listens_for(Session, 'after_flush')
+def _apply_deltas(session, flush_context):
+    connection = session.connection()
+    deltas = connection.info.pop(DELTAS_KEY, None)
+    if not deltas:
+        return
+    for name, delta in deltas.items():
+        if delta:
+            connection.execute(update(_table).where(_table.c.name == name).values(value=_table.c.value + delta))
+
+def _counts():
+    out = {}
+    for name, (model, condition) in COUNTERS.items():
+        stmt = select(func.count()).select_from(model)
+        if condition is not None:
+            attr, _, clause = condition
+            stmt = stmt.where(clause(getattr(model, attr)))
+        out[name] = db.session.scalar(stmt)
+    return out
+
+def reconcile():
+    """Alle Zähler neu zählen und speichern. Rückgabe: {name: wert}."""
+    counts = _counts()
+    now = datetime.utcnow()
+    existing = {name for (name,) in db.session.execute(select(_table.c.name))}
+    for name, value in counts.items():
+        if name in existing:
+            db.session.execute(update(_table).where(_table.c.name == name).values(value=value, reconciled_at=now))
+        else:
+            db.session.execute(insert(_table).values(name=name, value=value, reconciled_at=now))
+    db.session.commit()
+    return counts
+
+def _reconcile_task(app):
+    global _reconciling
+    try:
+        with app.app_context():
+            try:
+                reconcile()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning('Abgleich der Admin-Zähler fehlgeschlagen: %r', e)
+    finally:
+        _reconciling = False
+
+def read(app):
+    """Alle Zähler mit einer Abfrage. Fehlen Zähler (erste Verwendung), wird sofort gezählt;
+    sind sie älter als STATS_RECONCILE_SECONDS, läuft der Abgleich im Hintergrund."""
+    global _reconciling
+    rows = db.session.execute(select(_table.c.name, _table.c.value, _table.c.reconciled_at)).all()
+    values = {name: value for name, value, _ in rows}
+    if any(name not in values for name in COUNTERS):
+        return reconcile()
+    oldest = min((r for _, _, r in rows if r is not None), default=None)
+    max_age = timedelta(seconds=app.config.get('STATS_RECONCILE_SECONDS', 3600))
+    if oldest is None or datetime.utcnow() - oldest > max_age:
+        with _reconcile_lock:
+            start, _reconciling = not _reconciling, True
+        if start:
+            socketio.start_background_task(_reconcile_task, app)
+    return values
@@ -1,3 +1,125 @@
+// Service Worker: Push-Benachrichtigungen, App-Shell-Precache und Laufzeit-Caches.
+// Wird über /sw.js ausgeliefert (app.assets.service_worker); davor stehen dort
+// SW_VERSION (ändert sich mit jedem Asset-Build) und PRECACHE (fingerprinted Shell-Assets + /offline).
+/* global SW_VERSION, PRECACHE */
+const CACHES = {
+  shell: `fp-shell-${SW_VERSION}`,   // Precache: Assets der Seitenvorlage, Offline-Seite
+  pages: `fp-pages-${SW_VERSION}`,   // zuletzt geladene Seiten (nur Fallback ohne Netz)
+  data: `fp-data-${SW_VERSION}`,     // JSON-Feeds, stale-while-revalidate
+  images: `fp-images-${SW_VERSION}`, // Vorschaubilder und weitere /static/dist Dateien (unveränderlich)
+};
+const USER_CACHES = [CACHES.pages, CACHES.data, CACHES.images];
+const MAX_ENTRIES = { [CACHES.pages]: 30, [CACHES.data]: 60, [CACHES.images]: 400 };
+const NETWORK_TIMEOUT_MS = 4000;
+const SWR_PATHS = [/^\/calendar\/events$/, /^\/chat\/api\/messages$/];
+// Delta-Abfragen (Nachholen nach Reconnect, ältere Seiten) immer direkt ans Netz:
+// ein gecachtes [] für after_id=N würde beim nächsten Reconnect verpasste Nachrichten verschlucken
+const SWR_BYPASS_PARAMS = ['after_id', 'before_id'];
+const IMMUTABLE_PATHS = [/^\/photos\/thumb\//, /^\/static\/dist\//];
+
+self.addEventListener('install', event => {
+  event.waitUntil(caches.open(CACHES.shell).then(c => c.addAll(PRECACHE)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+  // Caches früherer Versionen entfernen
+  const current = new Set(Object.values(CACHES));
+  event.waitUntil(caches.keys()
+    .then(keys => Promise.all(keys.filter(k => k.startsWith('fp-') && !current.has(k)).map(k => caches.delete(k))))
+    .then(() => self.clients.claim()));
+});
+
+self.addEventListener('message', event => {
+  // Nach Logout: benutzerbezogene Daten nicht für den nächsten Benutzer liegen lassen
+  if (event.data && event.data.type === 'logout') {
+    event.waitUntil(Promise.all(USER_CACHES.map(k => caches.delete(k))));
+  }
+});
+
+self.addEventListener('fetch', event => {
+  const req = event.request;
+  if (req.method !== 'GET') return;
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+  if (req.mode === 'navigate') {
+    event.respondWith(networkFirst(event));
+  } else if (PRECACHE.includes(url.pathname + url.search)) {
+    event.respondWith(caches.match(req).then(hit => hit || fetch(req)));
+  } else if (IMMUTABLE_PATHS.some(p => p.test(url.pathname))) {
+    // URLs ändern sich mit dem Inhalt -> einmal laden, danach nur noch aus dem Cache
+    event.respondWith(cacheFirst(req, CACHES.images));
+  } else if (SWR_PATHS.some(p => p.test(url.pathname)) && !SWR_BYPASS_PARAMS.some(p => url.searchParams.has(p))) {
+    event.respondWith(staleWhileRevalidate(event, CACHES.data));
+  }
+});
+
+function cacheable(resp) {
+  return resp && resp.status === 200 && !resp.redirected && resp.type === 'basic';
+}
+
+async function put(cacheName, req, resp) {
+  const cache = await caches.open(cacheName);
+  await cache.put(req, resp);
+  const keys = await cache.keys();
+  const max = MAX_ENTRIES[cacheName];
+  if (max && keys.length > max) {
+    await Promise.all(keys.slice(0, keys.length - max).map(k => cache.delete(k)));
+  }
+}
+
+async function cacheFirst(req, cacheName) {
+  const hit = await caches.match(req);
+  if (hit) return hit;
+  const resp = await fetch(req);
+  if (cacheable(resp)) put(cacheName, req, resp.clone());
+  return resp;
+}
+
+function staleWhileRevalidate(event, cacheName) {
+  const req = event.request;
+  // Cache-Schlüssel ohne die If-None-Match-Header der Seite (fetchJSONCached)
+  const key = new Request(req.url, { credentials: 'same-origin' });
+  return caches.match(key).then(hit => {
+    const headers = hit && hit.headers.get('ETag') ? { 'If-None-Match': hit.headers.get('ETag') } : {};
+    const revalidate = fetch(key.url, { credentials: 'same-origin', cache: 'no-store', headers }).then(async resp => {
+      if (resp.status === 304 && hit) return hit;  // unverändert, kein Body übertragen
+      if (cacheable(resp)) {
+        await put(cacheName, key, resp.clone());
+        if (hit) notify(req.url);
+      }
+      return resp;
+    });
+    if (!hit) return revalidate;
+    event.waitUntil(revalidate.catch(() => {}));
+    return hit.clone();
+  });
+}
+
+async function notify(url) {
+  // Seiten können neu laden, wenn sie veraltete Daten aus dem Cache angezeigt haben
+  const list = await self.clients.matchAll({ type: 'window' });
+  list.forEach(c => c.postMessage({ type: 'sw:updated', url }));
+}
+
+async function networkFirst(event) {
+  const req = event.request;
+  const network = fetch(req).then(resp => {
+    if (cacheable(resp) && (resp.headers.get('Content-Type') || '').includes('text/html')) {
+      event.waitUntil(put(CACHES.pages, req, resp.clone()));
+    }
+    return resp;
+  });
+  // Langsames Netz: nach NETWORK_TIMEOUT_MS die zuletzt gespeicherte Fassung zeigen
+  const timeout = new Promise(resolve => setTimeout(resolve, NETWORK_TIMEOUT_MS)).then(() => caches.match(req));
+  try {
+    const first = await Promise.race([network, timeout]);
+    if (first) return first;
+    return await network;
+  } catch (e) {
+    return (await caches.match(req)) || (await caches.match('/offline')) || Response.error();
+  }
+}
+
 self.addEventListener('push', function(event){
   let data = {};
   try { data = event.data.json(); } catch(e) {}
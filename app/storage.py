@@ -0,0 +1,251 @@
+"""Inhaltsadressierte Ablage für Fotos und Avatare.
+
+Dateiname = SHA-256 der hochgeladenen Bytes + Endung (<sha256>.<ext>), abgelegt in zwei
+Verzeichnisebenen aus den ersten Hex-Zeichen: <bucket>/ab/cd/abcd….jpg. Gleiche Bilder
+(z.B. dasselbe Foto von drei Familienmitgliedern) liegen nur einmal auf der Platte, und kein
+Verzeichnis wächst über einige hundert Einträge. Der Schlüssel bezieht sich auf den Upload;
+die Bildverarbeitung (app.image_jobs) darf das Original danach bereinigen.
+
+StoredFile zählt die Referenzen (Photo.filename bzw. UserProfile.avatar_filename). Fällt der
+Zähler auf 0, werden Zeile, Original und Derivate entfernt – die Dateien erst nach dem
+erfolgreichen Commit. `flask storage-gc` gleicht Zähler und Dateien nachträglich ab.
+Alte Dateinamen (uuid4, vor der Umstellung) liegen weiter flach im Bucket-Verzeichnis.
+
+send() liefert Dateien aus: mit X_ACCEL_REDIRECT prüft Flask nur noch die Berechtigung und
+übergibt die Datei per X-Accel-Redirect an nginx (interne Location X_ACCEL_PREFIX -> UPLOAD_BASE,
+siehe nginx.conf); sonst wie bisher send_from_directory im Worker.
+"""
+import os
+import re
+import time
+import errno
+import click
+import mimetypes
+from datetime import datetime
+from urllib.parse import quote
+from flask import current_app, send_from_directory, abort
+from werkzeug.security import safe_join
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db, imaging
+from app.models import StoredFile, Photo, UserProfile
+
+BUCKETS = ('photos', 'avatars')
+CONTENT_NAME = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]{1,5})$')
+PURGE_KEY = 'storage_purge'
+STALE_PART_SECONDS = 3600
+
+def init_app(app):
+    @app.cli.command('storage-gc')
+    @click.option('--dry-run', is_flag=True, help='Nur anzeigen, nichts löschen.')
+    def storage_gc(dry_run):
+        """Referenzzähler neu berechnen, verwaiste Dateien und Einträge entfernen."""
+        for line in gc(dry_run=dry_run):
+            click.echo(line)
+
+def _base():
+    return current_app.config.get('UPLOAD_BASE') or '/tmp'
+
+def bucket_root(bucket):
+    target = os.path.join(_base(), bucket)
+    try:
+        os.makedirs(target, exist_ok=True)
+        return target
+    except PermissionError:
+        fallback = f'/tmp/family_portal_fallback/{bucket}'
+        os.makedirs(fallback, exist_ok=True)
+        return fallback
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return target
+
+def is_content_name(fname):
+    return bool(CONTENT_NAME.match(fname or ''))
+
+def dir_for(bucket, fname, create=False):
+    """Verzeichnis einer Datei (sharded für Inhaltsnamen, flach für alte Namen)."""
+    root = bucket_root(bucket)
+    if not is_content_name(fname):
+        return root
+    directory = os.path.join(root, fname[:2], fname[2:4])
+    if create:
+        os.makedirs(directory, exist_ok=True)
+    return directory
+
+def path_for(bucket, fname):
+    return os.path.join(dir_for(bucket, fname), fname)
+
+def send(directory, name, mimetype=None, as_attachment=False, max_age=None):
+    """Datei `name` aus `directory` ausliefern (per nginx, falls X_ACCEL_REDIRECT aktiv)."""
+    prefix = current_app.config.get('X_ACCEL_PREFIX')
+    if not current_app.config.get('X_ACCEL_REDIRECT') or not prefix:
+        return send_from_directory(directory, name, mimetype=mimetype, as_attachment=as_attachment, max_age=max_age)
+    path = safe_join(directory, name)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    rel = os.path.relpath(path, _base())
+    if rel.startswith('..'):
+        # Fallback-Verzeichnis (/tmp/family_portal_fallback) liegt außerhalb der nginx-Location
+        return send_from_directory(directory, name, mimetype=mimetype, as_attachment=as_attachment, max_age=max_age)
+    resp = current_app.response_class(mimetype=mimetype or mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    resp.headers['X-Accel-Redirect'] = quote(f"{prefix.rstrip('/')}/{rel.replace(os.sep, '/')}")
+    # Content-Type, Content-Disposition und Cache-Control übernimmt nginx aus dieser Antwort
+    if as_attachment:
+        resp.headers.set('Content-Disposition', 'attachment', filename=name)
+    if max_age is None:
+        resp.cache_control.no_cache = True  # wie send_from_directory
+    else:
+        resp.cache_control.max_age = max_age
+        resp.cache_control.public = True
+    return resp
+
+def store(bucket, spool):
+    """Upload (uploads.ImageSpool) ablegen bzw. dedupliziert referenzieren.
+    Rückgabe: (dateiname, neu) – neu=False, wenn der Inhalt schon vorhanden war.
+    Die Zähleränderung wird mit dem nächsten Commit der Session wirksam."""
+    spool.validate()
+    fname = f'{spool.sha256}.{spool.kind}'
+    directory = dir_for(bucket, fname, create=True)
+    # Erst referenzieren, dann prüfen: ein gleichzeitiges release() kann die Datei bis zur
+    # Prüfung entfernt haben (Zeile gelöscht, wir legen sie neu an) – dann wird der Spool gebraucht
+    _add_reference(bucket, fname, spool.size)
+    exists = os.path.isfile(os.path.join(directory, fname))
+    if exists:
+        spool.discard()
+    else:
+        spool.commit(fname, directory)
+    return fname, not exists
+
+def _add_reference(bucket, fname, size):
+    sha, ext = CONTENT_NAME.match(fname).groups()
+    updated = StoredFile.query.filter_by(bucket=bucket, sha256=sha).update(
+        {StoredFile.refcount: StoredFile.refcount + 1}, synchronize_session=False)
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredFile(bucket=bucket, sha256=sha, ext=ext, size=size, refcount=1, created_at=datetime.utcnow()))
+    except IntegrityError:
+        # Gleichzeitiger Upload desselben Inhalts hat die Zeile gerade angelegt
+        StoredFile.query.filter_by(bucket=bucket, sha256=sha).update(
+            {StoredFile.refcount: StoredFile.refcount + 1}, synchronize_session=False)
+
+def release(bucket, fname):
+    """Referenz freigeben; bei 0 werden Zeile und Dateien (nach dem Commit) entfernt.
+    Alte, nicht inhaltsadressierte Dateien werden direkt zum Löschen vorgemerkt."""
+    if not fname:
+        return
+    m = CONTENT_NAME.match(fname)
+    if not m:
+        _schedule_purge(bucket, fname)
+        return
+    StoredFile.query.filter_by(bucket=bucket, sha256=m.group(1)).update(
+        {StoredFile.refcount: StoredFile.refcount - 1}, synchronize_session=False)
+    row = StoredFile.query.filter_by(bucket=bucket, sha256=m.group(1)).first()
+    if row is not None and row.refcount <= 0:
+        db.session.delete(row)
+        _schedule_purge(bucket, fname)
+
+def _schedule_purge(bucket, fname):
+    db.session.info.setdefault(PURGE_KEY, []).append((bucket, dir_for(bucket, fname), fname))
+
+def _remove_files(directory, fname):
+    try:
+        os.remove(os.path.join(directory, fname))
+    except FileNotFoundError:
+        pass
+    imaging.remove_derivatives(directory, fname)
+    # Leere Shard-Verzeichnisse stehen lassen: sie werden bald wieder gebraucht
+
+@event.listens_for(Session, 'after_commit')
+def _purge_after_commit(session):
+    purge = session.info.pop(PURGE_KEY, ())
+    if not purge:
+        return
+    table = StoredFile.__table__
+    # Eigene Verbindung (die Session ist hier schon committed). Ein gleichzeitiges store() kann die
+    # Zeile inzwischen neu angelegt haben; FOR UPDATE wartet auf dessen Commit und sperrt den
+    # Schlüssel, bis die Dateien entfernt sind – store() prüft die Datei erst danach.
+    with db.engine.begin() as connection:
+        for bucket, directory, fname in purge:
+            m = CONTENT_NAME.match(fname)
+            if m:
+                stmt = select(table.c.id).where(table.c.bucket == bucket, table.c.sha256 == m.group(1)).with_for_update()
+                if connection.execute(stmt).first() is not None:
+                    continue
+            _remove_files(directory, fname)
+
+@event.listens_for(Session, 'after_rollback')
+def _purge_cancelled(session):
+    session.info.pop(PURGE_KEY, None)
+
+def _references():
+    """Tatsächliche Referenzen je (bucket, dateiname) aus den Tabellen."""
+    refs = {}
+    for fname, n in db.session.query(Photo.filename, func.count(Photo.id)).group_by(Photo.filename):
+        refs[('photos', fname)] = n
+    for fname, n in db.session.query(UserProfile.avatar_filename, func.count(UserProfile.user_id)).filter(
+            UserProfile.avatar_filename.isnot(None)).group_by(UserProfile.avatar_filename):
+        refs[('avatars', fname)] = n
+    return refs
+
+def gc(dry_run=False):
+    """Abgleich Zähler/Dateien. Rückgabe: Protokollzeilen."""
+    log = []
+    refs = _references()
+    known = set()
+    for row in StoredFile.query.all():
+        fname = f'{row.sha256}.{row.ext}'
+        actual = refs.get((row.bucket, fname), 0)
+        if actual == 0:
+            log.append(f'entferne {row.bucket}/{fname} (keine Referenz)')
+            if not dry_run:
+                db.session.delete(row)
+                _schedule_purge(row.bucket, fname)
+            continue
+        known.add((row.bucket, fname))
+        if row.refcount != actual:
+            log.append(f'korrigiere {row.bucket}/{fname}: {row.refcount} -> {actual}')
+            row.refcount = actual
+    for (bucket, fname), n in refs.items():
+        if is_content_name(fname) and (bucket, fname) not in known and os.path.isfile(path_for(bucket, fname)):
+            sha, ext = CONTENT_NAME.match(fname).groups()
+            log.append(f'ergänze Eintrag {bucket}/{fname} ({n} Referenzen)')
+            db.session.add(StoredFile(bucket=bucket, sha256=sha, ext=ext, size=os.path.getsize(path_for(bucket, fname)),
+                                      refcount=n, created_at=datetime.utcnow()))
+            known.add((bucket, fname))
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    # Dateien ohne Eintrag (z.B. Abbruch zwischen Ablage und Commit) und alte Upload-Reste
+    now = time.time()
+    for bucket in BUCKETS:
+        root = bucket_root(bucket)
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                if name.endswith('.part'):
+                    if now - os.path.getmtime(path) > STALE_PART_SECONDS:
+                        log.append(f'entferne Upload-Rest {path}')
+                        if not dry_run:
+                            os.remove(path)
+                    continue
+                if dirpath == root:
+                    continue  # flache Altbestände werden über Photo/UserProfile verwaltet
+                original = name.split('.', 1)[0]
+                if not any((bucket, f'{original}.{ext}') in known for ext in _extensions(name)):
+                    log.append(f'entferne verwaiste Datei {path}')
+                    if not dry_run:
+                        os.remove(path)
+    log.append('fertig' + (' (dry-run)' if dry_run else ''))
+    return log
+
+def _extensions(name):
+    """Mögliche Original-Endungen zu einer Datei im Shard (Original oder Derivat)."""
+    parts = name.split('.')
+    if len(parts) == 2:
+        return [parts[1]]
+    return ['jpg', 'png', 'gif', 'webp']
@@ -0,0 +1,165 @@
+"""Gestreamte Bild-Uploads mit früher Ablehnung.
+
+Normalerweise puffert Werkzeug Datei-Uploads im Speicher (bis 500 KB) bzw. in einer
+anonymen Temp-Datei, bevor die View sie prüft und mit save() ein zweites Mal kopiert.
+Für Endpoints mit @image_upload liefert UploadRequest stattdessen pro Datei einen ImageSpool,
+der die Chunks direkt in eine Temp-Datei im Zielverzeichnis schreibt und dabei
+  - die Dateiendung prüft, bevor das erste Byte gelesen wird,
+  - die ersten Bytes gegen bekannte Bild-Signaturen (Magic Bytes) prüft,
+  - die Größe pro Datei begrenzt.
+Bei Verstoß wird das Parsen sofort abgebrochen (der Rest des Bodys wird nicht mehr gelesen),
+die Temp-Datei gelöscht. Nebenbei wird der SHA-256 des Inhalts berechnet (app.storage legt Dateien
+inhaltsadressiert ab). Erst commit() verschiebt die fertige Datei atomar (os.replace) an ihren Platz.
+"""
+import io
+import os
+import hashlib
+import tempfile
+from flask import Request, request, current_app
+from werkzeug.exceptions import HTTPException
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+HEAD_BYTES = 12
+ALLOWED_EXT = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+class UploadRejected(HTTPException):
+    code = 415
+
+def _too_large(max_bytes):
+    return f'Datei zu groß (max. {max_bytes // (1024 * 1024)} MB)'
+
+def sniff(head):
+    """Dateityp anhand der ersten Bytes oder None."""
+    for magic, kind in SIGNATURES:
+        if head.startswith(magic):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class ImageSpool(io.RawIOBase):
+    """Schreibbarer Container für eine hochgeladene Datei (siehe Modul-Docstring)."""
+
+    def __init__(self, directory, max_bytes):
+        super().__init__()
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kind = None
+        self._head = b''
+        self._hash = hashlib.sha256()
+        self._committed = False
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        if self.kind is None:
+            self._head += bytes(data[:HEAD_BYTES])
+            if len(self._head) >= HEAD_BYTES:
+                self._check_head()
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.discard()
+            raise UploadRejected(_too_large(self.max_bytes))
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def _check_head(self):
+        self.kind = sniff(self._head)
+        if self.kind is None:
+            self.discard()
+            raise UploadRejected('Keine gültige Bilddatei')
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readinto(self, b):
+        return self._file.readinto(b)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def validate(self):
+        """Dateityp prüfen, auch bei Dateien kürzer als HEAD_BYTES (UploadRejected)."""
+        if self.kind is None:
+            self._check_head()
+
+    def commit(self, fname, directory=None):
+        """Datei atomar als `fname` ins Zielverzeichnis (bzw. `directory` auf demselben
+        Dateisystem) verschieben. Rückgabe: Zielpfad."""
+        self.validate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        target = os.path.join(directory or self.directory, fname)
+        os.replace(self.tmp_path, target)
+        self._committed = True
+        return target
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed:
+            try:
+                os.remove(self.tmp_path)
+            except FileNotFoundError:
+                pass
+            self._committed = True  # nichts mehr aufzuräumen
+
+    def close(self):
+        self.discard()
+        super().close()
+
+class UploadRequest(Request):
+    """Request-Klasse der App: Datei-Uploads an mit @image_upload markierte Endpoints landen
+    direkt in einem ImageSpool (auch wenn schon CSRFProtect in before_request das Formular parst)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        target = getattr(view, 'image_upload', None)
+        if target is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        directory_fn, max_bytes_key = target
+        max_bytes = current_app.config.get(max_bytes_key)
+        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if ext not in ALLOWED_EXT:
+            raise UploadRejected('Dateityp nicht erlaubt')
+        if max_bytes and content_length and content_length > max_bytes:
+            raise UploadRejected(_too_large(max_bytes))
+        return ImageSpool(directory_fn(), max_bytes)
+
+def image_upload(directory_fn, max_bytes_key):
+    """View-Decorator (unter @bp.route): Datei-Uploads nach directory_fn() streamen,
+    Größe pro Datei begrenzt durch app.config[max_bytes_key]."""
+    def decorator(f):
+        f.image_upload = (directory_fn, max_bytes_key)
+        return f
+    return decorator
+
+def received_image(field):
+    """ImageSpool aus Formularfeld `field` oder None, wenn keine Datei gewählt wurde."""
+    storage = request.files.get(field)
+    if storage is None or not isinstance(storage.stream, ImageSpool):
+        return None
+    return storage.stream
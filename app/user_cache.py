@@ -0,0 +1,76 @@
+"""Prozesslokaler Cache für den user_loader (current_user).
+
+Flask-Login lädt den Benutzer bei jedem Request – auch bei jedem Socket.IO Polling-Request und
+jedem Vorschaubild einer Galerie. Gecacht werden nur die Identitätsdaten (id, username, is_admin,
+deleted_at) für USER_CACHE_TTL Sekunden; load_user liefert daraus ein CachedUser. Greift eine
+Route auf weitere Attribute zu (email, Beziehungen, Methoden), lädt CachedUser einmalig das
+ORM-Objekt nach.
+
+Admin-Änderungen (edit_user, toggle_admin, reset_password, delete_user) rufen invalidate(user_id) auf.
+Bei mehreren Instanzen begrenzt die TTL, wie lange andere Prozesse alte Werte sehen.
+"""
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin
+from app import db
+from app.models import User
+
+_cache = {}  # user_id -> (expires_at, (username, is_admin, deleted_at))
+_lock = threading.Lock()
+
+class CachedUser(UserMixin):
+    """current_user aus dem Cache; unbekannte Attribute kommen vom ORM-Objekt (Lazy Load)."""
+
+    def __init__(self, user_id, username, is_admin, deleted_at):
+        self.id = user_id
+        self.username = username
+        self.is_admin = is_admin
+        self.deleted_at = deleted_at
+
+    @property
+    def is_deleted(self):
+        return self.deleted_at is not None
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_orm':
+            raise AttributeError(name)
+        orm = self.__dict__.get('_orm')
+        if orm is None:
+            orm = self.__dict__['_orm'] = db.session.get(User, self.id)
+        return getattr(orm, name)
+
+    def __repr__(self):
+        return f'<CachedUser {self.id} {self.username}>'
+
+def _ttl():
+    return current_app.config.get('USER_CACHE_TTL', 30)
+
+def load(user_id):
+    """CachedUser für user_id oder None (unbekannt bzw. soft-gelöscht)."""
+    try:
+        uid = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(uid)
+    if hit and hit[0] > now:
+        data = hit[1]
+    else:
+        row = db.session.query(User.username, User.is_admin, User.deleted_at).filter(User.id == uid).first()
+        if row is None:
+            return None
+        data = (row.username, bool(row.is_admin), row.deleted_at)
+        with _lock:
+            _cache[uid] = (now + _ttl(), data)
+    if data[2] is not None:
+        return None  # gelöschte Konten gelten als abgemeldet
+    return CachedUser(uid, *data)
+
+def invalidate(user_id=None):
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(user_id), None)
@@ -21,11 +21,21 @@ class Config:
         _raw_db_uri = f"{_raw_db_uri}{sep}charset=utf8mb4"
     SQLALCHEMY_DATABASE_URI = _raw_db_uri
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection Pool (app.db_pool); leer = Standard nach Worker-Modell (eventlet 10+20, threading 5+10).
+    # DB_POOL_RECYCLE muss unter MySQL wait_timeout liegen.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 0) or None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 10)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 280)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1','true','yes','on')
     
     # Upload Konfiguration
     # Upload Ziel (wird in create_app nochmal harmonisiert und ggf. auf instance/uploads gesetzt)
     UPLOAD_FOLDER = os.environ.get('UPLOAD_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
+    # Obergrenzen pro Datei für gestreamte Bild-Uploads (app.uploads)
+    PHOTO_MAX_BYTES = int(os.environ.get('PHOTO_MAX_BYTES') or 16 * 1024 * 1024)
+    AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES') or 5 * 1024 * 1024)
     
     # Mail Konfiguration
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -43,4 +53,38 @@ class Config:
     VAPID_PRIVATE_KEY = os.environ.get('VAPID_PRIVATE_KEY') or ''
     VAPID_CLAIM_EMAIL = os.environ.get('VAPID_CLAIM_EMAIL') or 'admin@dchome.app'
     ENABLE_WEB_PUSH = True
+    # Socket.IO über mehrere Worker/Instanzen: redis://… oder amqp://… (leer = nur dieser Prozess,
+    # local:// = In-Process Stand-in für Tests). async_mode leer = automatisch aus der Worker-Klasse.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'family-portal'
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+    # Chat Write-Behind: Flush-Intervall (Sekunden) und Batchgröße für sofortiges Speichern
+    CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL') or 0.25)
+    CHAT_FLUSH_MAX_BATCH = int(os.environ.get('CHAT_FLUSH_MAX_BATCH') or 50)
+    # Benachrichtigungs-Outbox: Dispatcher im App-Prozess (0 = separater `flask notifications-worker`)
+    NOTIFY_DISPATCHER_IN_APP = os.environ.get('NOTIFY_DISPATCHER_IN_APP', '1').lower() in ('1','true','yes','on')
+    NOTIFY_DISPATCH_WORKERS = int(os.environ.get('NOTIFY_DISPATCH_WORKERS') or 4)
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE') or 100)
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS') or 5)
+    NOTIFY_POLL_INTERVAL = float(os.environ.get('NOTIFY_POLL_INTERVAL') or 5)
+    NOTIFY_RETRY_BASE_SECONDS = int(os.environ.get('NOTIFY_RETRY_BASE_SECONDS') or 30)
+    NOTIFY_CLAIM_SECONDS = int(os.environ.get('NOTIFY_CLAIM_SECONDS') or 120)
+    # Cache für Benachrichtigungs-Präferenzen/Push-Subscriptions pro Benutzer (Sekunden)
+    NOTIFY_PREF_CACHE_TTL = int(os.environ.get('NOTIFY_PREF_CACHE_TTL') or 60)
+    # Web Push: Verbindungen pro Push-Dienst, parallele Sends, Timeout (Sekunden)
+    PUSH_POOL_SIZE = int(os.environ.get('PUSH_POOL_SIZE') or 10)
+    PUSH_MAX_WORKERS = int(os.environ.get('PUSH_MAX_WORKERS') or 8)
+    PUSH_TIMEOUT = float(os.environ.get('PUSH_TIMEOUT') or 10)
+    # Bildverarbeitung (Vorschaubilder, Metadaten entfernen) in N Prozessen; 0 = synchron im Request
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)
+    # Fotos/Avatare per X-Accel-Redirect von nginx ausliefern (interne Location, siehe nginx.conf);
+    # 0 = Dateien wie bisher über den Worker streamen (Entwicklung ohne nginx)
+    X_ACCEL_REDIRECT = os.environ.get('X_ACCEL_REDIRECT', '0').lower() in ('1','true','yes','on')
+    X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX') or '/_protected'
+    # Cache der Identitätsdaten für current_user (user_loader), Sekunden
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)
+    # /admin/metrics (Prometheus): Scraper authentifiziert sich mit "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    # Admin-Zähler (stat_counters): Abgleich mit COUNT(*) spätestens nach so vielen Sekunden
+    STATS_RECONCILE_SECONDS = int(os.environ.get('STATS_RECONCILE_SECONDS') or 3600)
     # Finance Module entfernt – FINANCE_FAMILY_SHARED nicht mehr genutzt
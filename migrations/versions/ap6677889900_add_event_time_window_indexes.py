@@ -0,0 +1,38 @@
+"""Add composite time window and recurrence indexes on event
+
+Revision ID: ap6677889900
+Revises: ao5566778899
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'ap6677889900'
+down_revision = 'ao5566778899'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_event_start_end': ['start_time', 'end_time'],
+    'ix_event_end_start': ['end_time', 'start_time'],
+    'ix_event_recurrence': ['is_recurring', 'recurrence'],
+}
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'event' in insp.get_table_names():
+        existing = {ix['name'] for ix in insp.get_indexes('event')}
+        for name, cols in INDEXES.items():
+            if name not in existing:
+                op.create_index(name, 'event', cols)
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'event' in insp.get_table_names():
+        existing = {ix['name'] for ix in insp.get_indexes('event')}
+        for name in INDEXES:
+            if name in existing:
+                op.drop_index(name, table_name='event')
@@ -0,0 +1,36 @@
+"""Add updated_at to event (ETag for calendar feed)
+
+Revision ID: aq7788990011
+Revises: ap6677889900
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'aq7788990011'
+down_revision = 'ap6677889900'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'event' in insp.get_table_names():
+        cols = {c['name'] for c in insp.get_columns('event')}
+        if 'updated_at' not in cols:
+            op.add_column('event', sa.Column('updated_at', sa.DateTime(), nullable=True))
+            op.create_index('ix_event_updated_at', 'event', ['updated_at'])
+            op.execute("UPDATE event SET updated_at = created_at")
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'event' in insp.get_table_names():
+        cols = {c['name'] for c in insp.get_columns('event')}
+        if 'updated_at' in cols:
+            try:
+                op.drop_index('ix_event_updated_at', table_name='event')
+            except Exception:
+                pass
+            op.drop_column('event', 'updated_at')
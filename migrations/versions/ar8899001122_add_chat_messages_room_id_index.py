@@ -0,0 +1,30 @@
+"""Add composite index (room_id, id) on chat_messages
+
+Revision ID: ar8899001122
+Revises: aq7788990011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'ar8899001122'
+down_revision = 'aq7788990011'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'chat_messages' in insp.get_table_names():
+        existing = {ix['name'] for ix in insp.get_indexes('chat_messages')}
+        if 'ix_chat_messages_room_id_id' not in existing:
+            op.create_index('ix_chat_messages_room_id_id', 'chat_messages', ['room_id', 'id'])
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'chat_messages' in insp.get_table_names():
+        existing = {ix['name'] for ix in insp.get_indexes('chat_messages')}
+        if 'ix_chat_messages_room_id_id' in existing:
+            op.drop_index('ix_chat_messages_room_id_id', table_name='chat_messages')
@@ -0,0 +1,47 @@
+"""Outbox columns on notification_events (attempts, next_attempt_at, last_error)
+
+Revision ID: as9900112233
+Revises: ar8899001122
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'as9900112233'
+down_revision = 'ar8899001122'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'notification_events' in insp.get_table_names():
+        cols = {c['name'] for c in insp.get_columns('notification_events')}
+        if 'attempts' not in cols:
+            op.add_column('notification_events', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        if 'next_attempt_at' not in cols:
+            op.add_column('notification_events', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+        if 'last_error' not in cols:
+            op.add_column('notification_events', sa.Column('last_error', sa.String(length=255), nullable=True))
+        if 'attempts' not in cols:
+            # Altbestand (vor der Outbox nie zugestellte E-Mail/Push Events) nicht nachträglich verschicken
+            bind.execute(sa.text(
+                "UPDATE notification_events SET attempts = 99, last_error = 'vor Outbox-Migration' "
+                "WHERE (delivered = :f OR delivered IS NULL) AND channel IN ('email', 'push')"
+            ), {'f': False})
+        existing = {ix['name'] for ix in insp.get_indexes('notification_events')}
+        if 'ix_notification_events_outbox' not in existing:
+            op.create_index('ix_notification_events_outbox', 'notification_events', ['delivered', 'next_attempt_at'])
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'notification_events' in insp.get_table_names():
+        existing = {ix['name'] for ix in insp.get_indexes('notification_events')}
+        if 'ix_notification_events_outbox' in existing:
+            op.drop_index('ix_notification_events_outbox', table_name='notification_events')
+        cols = {c['name'] for c in insp.get_columns('notification_events')}
+        for col in ('last_error', 'next_attempt_at', 'attempts'):
+            if col in cols:
+                op.drop_column('notification_events', col)
@@ -0,0 +1,40 @@
+"""Photo processing state and dimensions (processing_state, processed_at, width, height, bytes)
+
+Revision ID: at0011223344
+Revises: as9900112233
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'at0011223344'
+down_revision = 'as9900112233'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ('processing_state', lambda: sa.Column('processing_state', sa.String(length=10), nullable=False, server_default='ready')),
+    ('processed_at', lambda: sa.Column('processed_at', sa.DateTime(), nullable=True)),
+    ('width', lambda: sa.Column('width', sa.Integer(), nullable=True)),
+    ('height', lambda: sa.Column('height', sa.Integer(), nullable=True)),
+    ('bytes', lambda: sa.Column('bytes', sa.Integer(), nullable=True)),
+)
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'photos' in insp.get_table_names():
+        cols = {c['name'] for c in insp.get_columns('photos')}
+        for name, column in COLUMNS:
+            if name not in cols:
+                op.add_column('photos', column())
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'photos' in insp.get_table_names():
+        cols = {c['name'] for c in insp.get_columns('photos')}
+        for name, _ in reversed(COLUMNS):
+            if name in cols:
+                op.drop_column('photos', name)
@@ -0,0 +1,55 @@
+"""Content-addressed photo/avatar storage (stored_files, non-unique photos.filename)
+
+Revision ID: au1122334455
+Revises: at0011223344
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'au1122334455'
+down_revision = 'at0011223344'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'stored_files' not in insp.get_table_names():
+        op.create_table(
+            'stored_files',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('bucket', sa.String(length=20), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('ext', sa.String(length=5), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('bucket', 'sha256', name='uq_stored_file_bucket_sha'),
+        )
+    if 'photos' in insp.get_table_names():
+        # Mehrere Fotos dürfen dieselbe (deduplizierte) Datei referenzieren
+        indexes = {ix['name']: ix for ix in insp.get_indexes('photos')}
+        if 'ux_photo_filename' in indexes:
+            op.drop_index('ux_photo_filename', table_name='photos')
+        uniques = [uc['name'] for uc in insp.get_unique_constraints('photos') if uc['column_names'] == ['filename']]
+        if uniques:
+            with op.batch_alter_table('photos') as batch:
+                for name in uniques:
+                    if name:
+                        batch.drop_constraint(name, type_='unique')
+        if 'ix_photos_filename' not in indexes:
+            op.create_index('ix_photos_filename', 'photos', ['filename'])
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'photos' in insp.get_table_names():
+        indexes = {ix['name'] for ix in insp.get_indexes('photos')}
+        if 'ix_photos_filename' in indexes:
+            op.drop_index('ix_photos_filename', table_name='photos')
+        if 'ux_photo_filename' not in indexes:
+            op.create_index('ux_photo_filename', 'photos', ['filename'], unique=True)
+    if 'stored_files' in insp.get_table_names():
+        op.drop_table('stored_files')
@@ -0,0 +1,57 @@
+"""Materialized admin statistics (stat_counters)
+
+Revision ID: av2233445566
+Revises: au1122334455
+Create Date: 2026-10-18
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'av2233445566'
+down_revision = 'au1122334455'
+branch_labels = None
+depends_on = None
+
+# Startwerte wie app.stat_counters.COUNTERS (Tabelle, Bedingung)
+SEED = (
+    ('users_total', 'user', None),
+    ('users_soft_deleted', 'user', 'deleted_at IS NOT NULL'),
+    ('events_total', 'event', None),
+    ('messages_total', 'message', None),
+    ('photos_total', 'photos', None),
+    ('expenses_total', 'expense', None),
+    ('audit_total', 'audit_log', None),
+    ('recurring_active', 'recurring_transaction', 'active = 1'),
+)
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    if 'stat_counters' not in tables:
+        op.create_table(
+            'stat_counters',
+            sa.Column('name', sa.String(length=40), primary_key=True),
+            sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+        )
+    existing = {row[0] for row in bind.execute(sa.text('SELECT name FROM stat_counters'))}
+    counters = sa.table('stat_counters', sa.column('name'), sa.column('value'), sa.column('reconciled_at'))
+    now = datetime.utcnow()
+    for name, table, condition in SEED:
+        if name in existing:
+            continue
+        value = 0
+        if table in tables:
+            quoted = bind.dialect.identifier_preparer.quote(table)
+            where = f' WHERE {condition}' if condition else ''
+            value = bind.execute(sa.text(f'SELECT COUNT(*) FROM {quoted}{where}')).scalar() or 0
+        bind.execute(counters.insert().values(name=name, value=value, reconciled_at=now))
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'stat_counters' in insp.get_table_names():
+        op.drop_table('stat_counters')
@@ -0,0 +1,29 @@
+"""Composite index audit_log (action, created_at) for filtered keyset pagination
+
+Revision ID: aw3344556677
+Revises: av2233445566
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+revision = 'aw3344556677'
+down_revision = 'av2233445566'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_audit_log_action_created'
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'audit_log' not in insp.get_table_names():
+        return
+    if INDEX not in {ix['name'] for ix in insp.get_indexes('audit_log')}:
+        op.create_index(INDEX, 'audit_log', ['action', 'created_at'])
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    if 'audit_log' in insp.get_table_names() and INDEX in {ix['name'] for ix in insp.get_indexes('audit_log')}:
+        op.drop_index(INDEX, table_name='audit_log')
@@ -0,0 +1,63 @@
+"""Full-text search: FULLTEXT on MySQL, FTS5 shadow tables on SQLite (audit_log.details, chat_messages.content)
+
+Revision ID: ax4455667788
+Revises: aw3344556677
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = 'ax4455667788'
+down_revision = 'aw3344556677'
+branch_labels = None
+depends_on = None
+
+# (Tabelle, Spalte) wie app.search.SOURCES
+SOURCES = (('audit_log', 'details'), ('chat_messages', 'content'))
+
+def _sqlite_ddl(tablename, column):
+    fts = f'{tablename}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{tablename}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tablename} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        # Bestehende Zeilen indexieren
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+def upgrade():
+    bind = op.get_bind()
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    for tablename, column in SOURCES:
+        if tablename not in tables:
+            continue
+        if bind.dialect.name == 'mysql':
+            name = f'ft_{tablename}_{column}'
+            if name not in {ix['name'] for ix in insp.get_indexes(tablename)}:
+                op.create_index(name, tablename, [column], mysql_prefix='FULLTEXT')
+        elif bind.dialect.name == 'sqlite':
+            for statement in _sqlite_ddl(tablename, column):
+                bind.execute(sa.text(statement))
+
+def downgrade():  # pragma: no cover
+    bind = op.get_bind()
+    insp = inspect(bind)
+    for tablename, column in SOURCES:
+        if tablename not in insp.get_table_names():
+            continue
+        if bind.dialect.name == 'mysql':
+            name = f'ft_{tablename}_{column}'
+            if name in {ix['name'] for ix in insp.get_indexes(tablename)}:
+                op.drop_index(name, table_name=tablename)
+        elif bind.dialect.name == 'sqlite':
+            fts = f'{tablename}_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                bind.execute(sa.text(f'DROP TRIGGER IF EXISTS {fts}_{suffix}'))
+            bind.execute(sa.text(f'DROP TABLE IF EXISTS {fts}'))
@@ -0,0 +1,95 @@
+"""Benchmark für den Kalender-Feed (/calendar/events).
+
+Vergleicht das alte Verhalten (alle Events laden) mit der Fenster-Abfrage
+(_events_in_window) bei wachsender Historie (konstante Termindichte im Ansichtsfenster). Läuft gegen eine temporäre SQLite DB.
+
+Aufruf:  python scripts/bench_calendar_feed.py [--sizes 1000,10000,100000,1000000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import insert
+from app import db
+from app.models import User, Event
+from app.calendar.routes import _events_in_window
+
+def _make_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def _fill(target, already, user_id, anchor, rnd):
+    """Füllt die Event-Tabelle auf `target` Zeilen. Die Historie wächst rückwärts ab `anchor`
+    (ca. ein Termin alle 2 Stunden), die ersten 200 Zeilen sind Geburtstage."""
+    batch = []
+    for i in range(already, target):
+        start = anchor - timedelta(hours=2*i, minutes=rnd.randrange(0, 120))
+        birthday = i < 200
+        batch.append({
+            'title': 'Geburtstag' if birthday else 'Termin',
+            'start_time': start,
+            'end_time': start if birthday else start + timedelta(hours=1),
+            'user_id': user_id,
+            'all_day': birthday,
+            'event_type': 'birthday' if birthday else 'default',
+            'is_recurring': birthday,
+            'recurrence': 'annual' if birthday else None,
+            'is_important': False,
+        })
+        if len(batch) >= 20000:
+            db.session.execute(insert(Event), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Event), batch)
+    db.session.commit()
+
+def _timed(fn, repeat):
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        rows = len(fn())
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best * 1000, rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    sizes = sorted(int(x) for x in args.sizes.split(','))
+
+    tmpdir = tempfile.mkdtemp(prefix='bench_calendar_')
+    app = _make_app(os.path.join(tmpdir, 'bench.db'))
+    rnd = random.Random(42)
+    view_start = datetime(2025, 9, 1)
+    view_end = datetime(2025, 10, 13)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.invalid')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        filled = 0
+        print(f"{'Events':>10} | {'alle laden (ms)':>16} | {'Fenster (ms)':>13} | {'Zeilen alt':>10} | {'Zeilen neu':>10}")
+        for size in sizes:
+            _fill(size, filled, user_id, view_end + timedelta(days=7), rnd)
+            filled = size
+            t_all, n_all = _timed(lambda: Event.query.all(), args.repeat)
+            t_win, n_win = _timed(lambda: _events_in_window(view_start, view_end), args.repeat)
+            print(f"{size:>10} | {t_all:>16.1f} | {t_win:>13.1f} | {n_all:>10} | {n_win:>10}")
+
+if __name__ == '__main__':
+    main()
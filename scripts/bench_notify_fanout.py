@@ -0,0 +1,142 @@
+"""Benchmark: Benachrichtigung an viele Empfänger – Schleife über notify_user vs. notify_users.
+
+Zwei Phasen werden getrennt gemessen:
+  1. Einreihen: N x notify_user (N Commits, Präferenzen pro Benutzer) vs. ein notify_users
+     (ein Bulk-Insert, ein Commit, Präferenzen gebündelt). Gezählt werden Zeit und SQL-Statements.
+  2. SMTP: N x mail.send (je eine neue Verbindung, wie früher) vs. Dispatcher-Batch über eine
+     gemeinsame Verbindung (mail.connect()). Gegen einen lokalen Fake-SMTP-Server, der pro
+     Verbindung --connect-ms Verzögerung (TLS/Handshake) simuliert.
+Läuft gegen eine temporäre SQLite DB; der Präferenz-Cache wird vor jedem Lauf geleert.
+
+Aufruf:  python scripts/bench_notify_fanout.py [--recipients 50] [--repeat 3] [--connect-ms 20]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from flask_mail import Message as MailMessage
+from sqlalchemy import event
+from app import db, mail, socketio, notification_prefs
+from app.models import User, NotificationPreference, NotificationEvent
+from app.socket_handlers import notify_user, notify_users
+from app.notification_dispatcher import _build_jobs, _deliver_emails
+
+class _FakeSMTP(socketserver.StreamRequestHandler):
+    """Minimaler SMTP-Dialog; zählt Verbindungen und Nachrichten."""
+    def handle(self):
+        srv = self.server
+        time.sleep(srv.connect_delay)
+        with srv.lock:
+            srv.connections += 1
+        self.wfile.write(b'220 fake ESMTP\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line[:4].upper()
+            if cmd == b'DATA':
+                self.wfile.write(b'354 go ahead\r\n')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with srv.lock:
+                    srv.messages += 1
+                self.wfile.write(b'250 queued\r\n')
+            elif cmd == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            else:
+                self.wfile.write(b'250 ok\r\n')
+
+def _start_smtp(connect_ms):
+    srv = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _FakeSMTP)
+    srv.daemon_threads = True
+    srv.connect_delay = connect_ms / 1000.0
+    srv.connections = srv.messages = 0
+    srv.lock = threading.Lock()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def _make_app(db_path, smtp_port):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{db_path}', SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=smtp_port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_DEFAULT_SENDER='bench@example.invalid',
+    )
+    db.init_app(app)
+    mail.init_app(app)
+    socketio.init_app(app, async_mode='threading')
+    return app
+
+def _measure(fn, counter):
+    notification_prefs.invalidate()
+    counter[0] = 0
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000, counter[0]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipients', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--connect-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    smtp = _start_smtp(args.connect_ms)
+    tmpdir = tempfile.mkdtemp(prefix='bench_notify_')
+    app = _make_app(os.path.join(tmpdir, 'bench.db'), smtp.server_address[1])
+    payload = {'message': 'Neuer Termin', 'subject': 'Familienkalender'}
+    with app.app_context():
+        db.create_all()
+        users = [User(username=f'u{i}', email=f'u{i}@example.invalid') for i in range(args.recipients)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        for uid in user_ids:
+            for ch in ('email', 'socket'):
+                db.session.add(NotificationPreference(user_id=uid, kind='events', channel=ch, enabled=True))
+        db.session.commit()
+
+        statements = [0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+        best = {}
+        for _ in range(args.repeat):
+            runs = {
+                'loop': lambda: [notify_user(uid, 'events', payload) for uid in user_ids],
+                'bulk': lambda: notify_users(user_ids, 'events', payload),
+            }
+            for name, fn in runs.items():
+                ms, n = _measure(fn, statements)
+                if name not in best or ms < best[name][0]:
+                    best[name] = (ms, n)
+
+        jobs = _build_jobs(NotificationEvent.query.filter_by(channel='email').limit(args.recipients).all())
+        messages = [MailMessage(subject='Familienkalender', recipients=[j['email']], body='Neuer Termin') for j in jobs]
+        smtp.connections = 0
+        t0 = time.perf_counter()
+        for msg in messages:
+            mail.send(msg)
+        smtp_loop = ((time.perf_counter() - t0) * 1000, smtp.connections)
+        smtp.connections = 0
+        t0 = time.perf_counter()
+        _deliver_emails(app, jobs)
+        smtp_batch = ((time.perf_counter() - t0) * 1000, smtp.connections)
+
+    n = args.recipients
+    print(f"{n} Empfänger, E-Mail + Socket aktiviert (beste von {args.repeat})")
+    print(f"{'':<28} | {'Zeit (ms)':>10} | {'SQL/SMTP':>9}")
+    print(f"{'einreihen: notify_user x N':<28} | {best['loop'][0]:>10.1f} | {best['loop'][1]:>9}")
+    print(f"{'einreihen: notify_users':<28} | {best['bulk'][0]:>10.1f} | {best['bulk'][1]:>9}")
+    print(f"{'SMTP: mail.send x N':<28} | {smtp_loop[0]:>10.1f} | {smtp_loop[1]:>9}")
+    print(f"{'SMTP: eine Verbindung':<28} | {smtp_batch[0]:>10.1f} | {smtp_batch[1]:>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Prüft app.push_sender gegen einen lokalen Fake-Push-Dienst.
+
+Der Fake-Dienst (HTTP/1.1 mit Keep-Alive) antwortet je nach Pfad mit 201 (/ok/...),
+410 (/gone/...) oder 404 (/missing/...) und zählt TCP-Verbindungen. Geprüft wird:
+  - alle gültigen Subscriptions werden beliefert, abgelaufene (404/410) gelöscht
+  - ein zweiter Versand überspringt die gelöschten Subscriptions
+  - Verbindungen werden wiederverwendet (höchstens PUSH_POOL_SIZE pro Dienst)
+  - der VAPID JWT wird pro Audience nur einmal signiert
+
+Aufruf:  python scripts/check_push_sender.py
+"""
+import os
+import sys
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from flask import Flask
+from py_vapid import Vapid
+from app import db, notification_prefs, push_sender
+from app.models import User, PushSubscription
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _client_keys():
+    """p256dh/auth wie von einem Browser (für die Payload-Verschlüsselung)."""
+    pub = ec.generate_private_key(ec.SECP256R1()).public_key()
+    return _b64(pub.public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)), _b64(os.urandom(16))
+
+class _FakePush(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status = 410 if self.path.startswith('/gone') else 404 if self.path.startswith('/missing') else 201
+        with self.server.lock:
+            self.server.requests.append((self.path, self.headers.get('Authorization', '')))
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakePush)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    private = _b64(vapid.private_key.private_numbers().private_value.to_bytes(32, 'big'))
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', VAPID_PRIVATE_KEY=private, VAPID_PUBLIC_KEY='x',
+                      VAPID_CLAIM_EMAIL='check@example.invalid', PUSH_POOL_SIZE=4, PUSH_MAX_WORKERS=4)
+    db.init_app(app)
+
+    signed = [0]
+    original_sign = Vapid.sign
+    def counting_sign(self, claims, crypto_key=None):
+        signed[0] += 1
+        return original_sign(self, claims, crypto_key)
+    Vapid.sign = counting_sign
+
+    failures = []
+    with app.app_context():
+        db.create_all()
+        user = User(username='push', email='push@example.invalid')
+        db.session.add(user)
+        db.session.commit()
+        paths = [f'/ok/{i}' for i in range(20)] + ['/gone/1', '/gone/2', '/missing/1']
+        for path in paths:
+            p256dh, auth = _client_keys()
+            db.session.add(PushSubscription(user_id=user.id, endpoint=base + path, p256dh=p256dh, auth=auth))
+        db.session.commit()
+
+        first = push_sender.send(notification_prefs.get(user.id)['push'], '{"title": "Test"}')
+        removed = push_sender.prune(first['gone'])
+        second = push_sender.send(notification_prefs.get(user.id)['push'], '{"title": "Test"}')
+
+        if len(first['sent']) != 20 or first['errors']:
+            failures.append(f"erster Versand: {len(first['sent'])} gesendet, Fehler {first['errors']}")
+        if removed != 3 or PushSubscription.query.count() != 20:
+            failures.append(f'{removed} Subscriptions gelöscht, {PushSubscription.query.count()} übrig')
+        if len(second['sent']) != 20 or second['gone']:
+            failures.append(f"zweiter Versand: {len(second['sent'])} gesendet, {len(second['gone'])} abgelaufen")
+        if server.connections > app.config['PUSH_POOL_SIZE']:
+            failures.append(f'{server.connections} TCP-Verbindungen für {len(server.requests)} Requests')
+        if signed[0] != 1 or len({auth for _, auth in server.requests}) != 1:
+            failures.append(f'VAPID {signed[0]}x signiert')
+
+    if failures:
+        print('FEHLER: ' + '; '.join(failures))
+        sys.exit(1)
+    print(f'OK: {len(server.requests)} Requests über {server.connections} Verbindungen, '
+          f'VAPID 1x signiert, {removed} abgelaufene Subscriptions entfernt')
+
+if __name__ == '__main__':
+    main()
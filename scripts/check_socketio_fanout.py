@@ -0,0 +1,66 @@
+"""Prüft die Socket.IO Verteilung über eine Message Queue zwischen zwei "Workern".
+
+Zwei unabhängige Flask/SocketIO Instanzen (Worker A und B) hängen am In-Process
+Stand-in (SOCKETIO_MESSAGE_QUEUE=local://). Worker B läuft als echter Server auf einem
+freien Port, ein Socket.IO Client verbindet sich nur mit B und betritt dort den Raum
+user_1; Worker A emittiert in diesen Raum.
+
+Aufruf:  python scripts/check_socketio_fanout.py
+"""
+import os
+import sys
+import time
+import socket
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import socketio as python_socketio
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+from app.socketio_queue import socketio_options
+
+CONFIG = {'SOCKETIO_MESSAGE_QUEUE': 'local://', 'SOCKETIO_CHANNEL': 'fanout-check', 'SOCKETIO_ASYNC_MODE': 'threading'}
+
+def _worker(name):
+    app = Flask(name)
+    sio = SocketIO(app, **socketio_options(CONFIG))
+
+    @sio.on('connect')
+    def on_connect():
+        join_room('user_1')
+
+    return app, sio
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def main():
+    app_a, sio_a = _worker('worker_a')
+    app_b, sio_b = _worker('worker_b')
+    port = _free_port()
+    threading.Thread(target=sio_b.run, args=(app_b,), kwargs={'host': '127.0.0.1', 'port': port, 'allow_unsafe_werkzeug': True, 'log_output': False}, daemon=True).start()
+
+    received = threading.Event()
+    client = python_socketio.Client()
+    client.on('notification', lambda data: received.set())
+    for _ in range(50):
+        try:
+            client.connect(f'http://127.0.0.1:{port}', transports=['polling'])
+            break
+        except python_socketio.exceptions.ConnectionError:
+            time.sleep(0.1)
+    time.sleep(0.2)  # Raumbeitritt auf Worker B abwarten
+    # Emit außerhalb eines Requests (wie notify_user aus einem Hintergrund-Task) auf Worker A
+    sio_a.emit('notification', {'kind': 'system', 'payload': {'message': 'fanout'}}, to='user_1')
+    ok = received.wait(timeout=5)
+    client.disconnect()
+    if not ok:
+        print('FEHLER: Emit von Worker A kam nicht bei Client auf Worker B an')
+        sys.exit(1)
+    print('OK: Emit von Worker A wurde über die Queue an den Client auf Worker B zugestellt')
+
+if __name__ == '__main__':
+    main()